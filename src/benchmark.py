@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import time
+import re
+import random
+import argparse
+import tempfile
+import contextlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import hw9
+
+CITIES = ["kyiv", "lviv", "odesa", "kharkiv", "dnipro", "zaporizhzhia", "vinnytsia", "poltava"]
+WORDS = ["news", "city", "market", "river", "rain", "bridge", "school", "concert", "train", "park",
+         "sale", "bike", "flat", "car", "garden", "music", "festival", "road", "museum", "coffee"]
+FORMATS = ("txt", "json", "xml")
+
+
+# Synthetic feed generation
+def parse_mix(mix):
+    """Parse a record mix like 'news=6,ad=3,custom=1' into normalized weights."""
+    weights = {"news": 0, "ad": 0, "custom": 0}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in weights:
+            raise ValueError(f"Unknown record kind '{name}' in mix, expected news, ad or custom")
+        weights[name.strip()] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Record mix must have at least one positive weight")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def generate_records(count, mix, seed=0):
+    """Yield synthetic records as dicts, every text is unique so nothing is dropped as a duplicate."""
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))) + f" {i}"
+        if kind == "news":
+            yield {"type": "news", "city": rng.choice(CITIES), "text": text}
+        elif kind == "ad":
+            expiration = f"{rng.randint(2027, 2035)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            yield {"type": "private ad", "text": text, "expiration_date": expiration}
+        else:
+            yield {"type": "custom record", "record_type": "custom record", "data": text}
+
+
+def write_feed(file_path, file_format, records):
+    """Write synthetic records in the input format of the matching hw9 importer."""
+    if file_format == "txt":
+        with open(file_path, "w") as file:
+            for record in records:
+                if record["type"] == "news":
+                    file.write(f"News | {record['city']} | {record['text']}\n")
+                elif record["type"] == "private ad":
+                    file.write(f"Private Ad | {record['text']} | {record['expiration_date']}\n")
+                else:
+                    file.write(f"Custom Record | {record['data']}\n")
+    elif file_format == "json":
+        with open(file_path, "w") as file:
+            json.dump(list(records), file)
+    elif file_format == "xml":
+        root = ET.Element("records")
+        for record in records:
+            element = ET.SubElement(root, "record")
+            for key, value in record.items():
+                ET.SubElement(element, key).text = value
+        ET.ElementTree(root).write(file_path, encoding="utf-8")
+    else:
+        raise ValueError(f"Unknown feed format '{file_format}'")
+
+
+# Benchmark runs
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_case(file_format, count, mix, seed, db_profile):
+    """Import one synthetic feed through a fresh Application in a temporary folder."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        file_path = os.path.join(work_dir, f"records.{file_format}")
+        write_feed(file_path, file_format, generate_records(count, mix, seed))
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            hw9.metrics.reset()
+            app = hw9.Application(db_profile)
+            manager = app.manager
+
+            # Latency of each record from leaving the parser to the commit of its DB batch;
+            # records dropped as duplicates never get committed and aren't counted
+            parsed = {}
+            latencies = []
+            write_records = manager.write_records
+            db_manager = manager.db_manager
+            insert_batch = db_manager.insert_batch
+
+            def timed_write(records, *args, **kwargs):
+                def stamped():
+                    for record in records:
+                        parsed[id(record)] = time.perf_counter()
+                        yield record
+                return write_records(stamped(), *args, **kwargs)
+
+            def timed_insert(batch):
+                result = insert_batch(batch)
+                committed = time.perf_counter()
+                latencies.extend(committed - parsed.pop(id(record)) for record in batch)
+                return result
+            manager.write_records = timed_write
+            db_manager.insert_batch = timed_insert
+
+            started = time.perf_counter()
+            if file_format == "txt":
+                app.file_input_manager.process_file(file_path)
+            elif file_format == "json":
+                app.json_input_manager.process_json_file(file_path)
+            else:
+                app.xml_input_manager.process_xml_file(file_path)
+            elapsed = time.perf_counter() - started
+            manager.close()
+
+        return {
+            "format": file_format,
+            "db_profile": db_profile,
+            "records": count,
+            "seconds": round(elapsed, 4),
+            "records_per_sec": round(count / elapsed, 1) if elapsed > 0 else None,
+            "commit_p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+            "commit_p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+            "peak_rss_kb": peak_rss_kb(),
+            "db_size_bytes": os.path.getsize(os.path.join(work_dir, "news_feed.db")),
+            "feed_size_bytes": os.path.getsize(os.path.join(work_dir, "news_feed.txt")),
+            "stages": hw9.metrics.to_dict()["stages"],
+        }
+
+
+def run_benchmark(formats, count, mix, seed=0, db_profile="balanced"):
+    results = []
+    for file_format in formats:
+        # Each case runs in its own process so peak RSS is measured per case
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_case, file_format, count, mix, seed, db_profile).result()
+        print(f"{result['format']:>4}: {result['records_per_sec']} records/sec, "
+              f"parse to commit p50 {result['commit_p50_ms']} ms, p99 {result['commit_p99_ms']} ms, "
+              f"peak RSS {result['peak_rss_kb']} kB, DB {result['db_size_bytes']} bytes")
+        results.append(result)
+    return results
+
+
+# Feed counting benchmark
+def legacy_counts(file_path):
+    """Line by line counting as NewsFeedManager.calculate_counts used to do it."""
+    word_count = 0
+    letter_count = 0
+    total_letters = 0
+    with open(file_path, 'r') as file:
+        for line in file:
+            line = line.strip().lower()
+            words = re.findall(r'\w+', line)
+            word_count += len(words)
+            total_letters += len(line.replace(" ", ""))
+            letter_count += len([char for char in line if char.isalpha()])
+    return word_count, letter_count, total_letters
+
+
+def run_counting_benchmark(size_mb, mix, seed=0):
+    """Compare legacy and block counting of a synthetic news_feed.txt of about size_mb megabytes."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        feed_path = os.path.join(work_dir, "news_feed.txt")
+        target_size = size_mb * 1024 * 1024
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            with open(feed_path, "w") as file:
+                batch = 10000
+                index = 0
+                while file.tell() < target_size:
+                    for record in generate_records(batch, mix, seed + index):
+                        if record["type"] == "news":
+                            line = hw9.News(record["city"], record["text"]).format_record()
+                        elif record["type"] == "private ad":
+                            line = hw9.PrivateAd(record["text"], record["expiration_date"]).format_record()
+                        else:
+                            line = hw9.CustomRecord(record["record_type"], record["data"]).format_record()
+                        file.write(line)
+                    index += 1
+
+            started = time.perf_counter()
+            legacy = legacy_counts(feed_path)
+            legacy_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            stats = hw9.FeedStatistics(feed_path, os.path.join(work_dir, "feed-stats.json"))
+            block_seconds = time.perf_counter() - started
+
+        block = (stats.word_count, stats.letter_count, stats.total_letters)
+        result = {
+            "feed_size_bytes": os.path.getsize(feed_path),
+            "legacy_seconds": round(legacy_seconds, 3),
+            "block_seconds": round(block_seconds, 3),
+            "speedup": round(legacy_seconds / block_seconds, 2) if block_seconds > 0 else None,
+            "totals": list(block),
+            "identical": legacy == block,
+        }
+    print(f"feed {result['feed_size_bytes']} bytes: legacy {result['legacy_seconds']} s, "
+          f"block {result['block_seconds']} s, speedup {result['speedup']}x, identical totals: {result['identical']}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hw9 import paths with synthetic feeds.")
+    parser.add_argument("--records", type=int, default=10000, help="records per generated feed")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma-separated formats: txt, json, xml")
+    parser.add_argument("--mix", default="news=6,ad=3,custom=1", help="record mix weights")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-profile", default="balanced", choices=list(hw9.DBManager.PROFILES),
+                        help="SQLite performance profile")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON file to save the results to")
+    parser.add_argument("--counting-mb", type=int, metavar="MB",
+                        help="benchmark feed statistics counting on a synthetic feed of MB megabytes (e.g. 1024) "
+                             "instead of the import paths")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    if args.counting_mb:
+        result = run_counting_benchmark(args.counting_mb, parse_mix(args.mix), args.seed)
+        with open(output, "w") as file:
+            json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "counting": result}, file, indent=2)
+        print(f"Results saved to '{output}'.")
+        return
+
+    formats = [item.strip() for item in args.formats.split(",") if item.strip()]
+    for file_format in formats:
+        if file_format not in FORMATS:
+            parser.error(f"unknown format '{file_format}'")
+
+    results = run_benchmark(formats, args.records, parse_mix(args.mix), args.seed, args.db_profile)
+    with open(output, "w") as file:
+        json.dump({
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "records": args.records,
+            "mix": args.mix,
+            "seed": args.seed,
+            "db_profile": args.db_profile,
+            "results": results,
+        }, file, indent=2)
+    print(f"Results saved to '{output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import sys
+import argparse
+
+# Subcommands import hw9 (and json) themselves, so `--help` and argument errors
+# don't pay for it and each command only loads what it needs
+
+
+def import_command(args):
+    """Import files and folders without prompts, the way the menu options 4 to 7 do."""
+    import hw9
+
+    manager = hw9.NewsFeedManager(args.feed, segments_folder=args.segments_folder, db_profile=args.db_profile,
+                                  metrics_file=args.metrics_file, prometheus_file=args.prometheus_file,
+                                  near_duplicates=args.near_duplicates, similarity=args.similarity)
+    file_input_manager = hw9.FileInputManager(manager)
+    json_input_manager = hw9.JsonInputManager(manager)
+    xml_input_manager = hw9.XmlInputManager(manager)
+    report = hw9.ImportReport("import")
+    missing = 0
+    try:
+        for path in args.paths:
+            extension = os.path.splitext(path)[1].lower()
+            if os.path.isdir(path):
+                file_report = file_input_manager.process_folder(path, args.workers, args.chunk_size)
+            elif not os.path.exists(path):
+                print(f"File '{path}' does not exist.")
+                missing += 1
+                continue
+            elif extension in (".json", ".jsonl"):
+                file_report = json_input_manager.process_json_file(path)
+            elif extension == ".xml":
+                file_report = xml_input_manager.process_xml_file(path)
+            else:
+                file_report = file_input_manager.process_file(path, args.chunk_size)
+            if file_report is not None:
+                report.merge(file_report)
+    finally:
+        manager.close()
+
+    if args.report:
+        report.save(args.report)
+        print(f"Import report saved to '{args.report}'.")
+    return 1 if missing or report.failures or (args.strict and report.rejects) else 0
+
+
+def stats_command(args):
+    """Print the feed totals from the saved statistics, without opening the database."""
+    import json
+    import hw9
+
+    stats = hw9.FeedStatistics(args.feed, args.stats_file)
+    segments = hw9.FeedSegments(args.segments_folder)
+    words = stats.words + segments.words
+    letters = stats.letters + segments.letters
+    result = {
+        "word_count": stats.word_count + segments.word_count,
+        "letter_count": stats.letter_count + segments.letter_count,
+        "total_letters": stats.total_letters + segments.total_letters,
+        "feed_size_bytes": stats.size,
+        "closed_segments": len(segments.segments),
+        "top_words": words.most_common(args.top),
+        "top_letters": letters.most_common(args.top),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    print(f"Words: {result['word_count']}, letters: {result['letter_count']}, "
+          f"characters: {result['total_letters']}")
+    print(f"Open feed: {result['feed_size_bytes']} bytes, closed segments: {result['closed_segments']}")
+    print("Top words: " + ", ".join(f"{word} ({count})" for word, count in result["top_words"]))
+    print("Top letters: " + ", ".join(f"{letter} ({count})" for letter, count in result["top_letters"]))
+    return 0
+
+
+def export_command(args):
+    import hw9
+
+    if args.what == "snapshot":
+        segments = hw9.FeedSegments(args.segments_folder)
+        output = args.output or "news_feed.snapshot"
+        count = hw9.FeedSnapshot.export(segments.paths() + [args.feed], output)
+        print(f"Snapshot '{output}' with {count} records exported.")
+    else:
+        manager = hw9.NewsFeedManager(args.feed, segments_folder=args.segments_folder, csv_top_k=args.top_k or None)
+        try:
+            manager.ensure_current()
+            manager.recreate_csvs()
+        finally:
+            manager.close()
+    return 0
+
+
+def query_command(args):
+    import json
+    import hw9
+
+    if not os.path.exists(args.db):
+        print(f"Database '{args.db}' does not exist.")
+        return 1
+    db_manager = hw9.DBManager(args.db, read_only=True)
+    try:
+        if args.what == "search":
+            rows = db_manager.search(" ".join(args.terms), args.page, args.limit)
+        elif args.what == "city":
+            rows = db_manager.news_by_city(args.city, args.limit)
+        elif args.what == "between":
+            rows = db_manager.news_between(args.start, args.end, args.limit)
+        elif args.what == "latest":
+            rows = db_manager.latest_news(args.limit)
+        elif args.what == "near-duplicates":
+            rows = db_manager.near_duplicate_news(args.limit)
+        else:
+            rows = db_manager.ads_expiring_before(args.date, args.limit)
+    finally:
+        db_manager.close()
+
+    if args.json:
+        print(json.dumps(rows, indent=2, default=str))
+    else:
+        for row in rows:
+            print(" | ".join(str(value) for value in row.values()))
+    return 0
+
+
+def purge_command(args):
+    """Archive expired private ads, meant to be run from cron."""
+    import hw9
+
+    db_manager = hw9.DBManager(args.db, near_duplicates="off", bloom_filters=False)
+    try:
+        db_manager.purge_expired_ads(args.before, args.batch_size)
+    finally:
+        db_manager.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Non-interactive news feed tool for scripts and cron jobs.")
+    parser.add_argument("--feed", default="news_feed.txt", help="feed file (default: news_feed.txt)")
+    parser.add_argument("--segments-folder", default="news_feed_segments")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="import .txt, .json, .jsonl and .xml files or folders of them")
+    import_parser.add_argument("paths", nargs="+", help="text input files are removed once imported, like in the menu")
+    import_parser.add_argument("--chunk-size", type=int, default=500)
+    import_parser.add_argument("--workers", type=int, help="parser processes for folder imports")
+    import_parser.add_argument("--db-profile", default="balanced", choices=["durable", "balanced", "bulk-load"])
+    import_parser.add_argument("--near-duplicates", default="off", choices=["flag", "drop", "off"],
+                               help="what to do with news that are near duplicates of earlier news")
+    import_parser.add_argument("--similarity", type=float, default=0.7,
+                               help="estimated Jaccard similarity from which news are near duplicates")
+    import_parser.add_argument("--report", help="save the rejected rows report as JSON")
+    import_parser.add_argument("--strict", action="store_true", help="exit with status 1 if any row was rejected")
+    import_parser.add_argument("--metrics-file", help="write stage metrics as JSON")
+    import_parser.add_argument("--prometheus-file", help="write stage metrics in Prometheus text format")
+    import_parser.set_defaults(handler=import_command)
+
+    stats_parser = commands.add_parser("stats", help="print word and letter totals of the feed")
+    stats_parser.add_argument("--stats-file", default="feed-stats.json")
+    stats_parser.add_argument("--top", type=int, default=10, help="number of most frequent words and letters")
+    stats_parser.add_argument("--json", action="store_true")
+    stats_parser.set_defaults(handler=stats_command)
+
+    export_parser = commands.add_parser("export", help="export a columnar snapshot or recreate the CSVs")
+    export_parser.add_argument("what", choices=["snapshot", "csv"])
+    export_parser.add_argument("--output", help="snapshot file (default: news_feed.snapshot)")
+    export_parser.add_argument("--top-k", type=int, default=1000,
+                               help="most frequent words and letters in the CSVs, 0 for all of them (default: 1000)")
+    export_parser.set_defaults(handler=export_command)
+
+    purge_parser = commands.add_parser("purge", help="move expired private ads to the archive table")
+    purge_parser.add_argument("--db", default="news_feed.db")
+    purge_parser.add_argument("--before", help="archive ads that expired before this time (default: now)")
+    purge_parser.add_argument("--batch-size", type=int, default=1000)
+    purge_parser.set_defaults(handler=purge_command)
+
+    query_parser = commands.add_parser("query", help="query the records database")
+    query_parser.add_argument("--db", default="news_feed.db")
+    # Shared by every query so the options can follow the query name
+    query_options = argparse.ArgumentParser(add_help=False)
+    query_options.add_argument("--limit", type=int, default=20)
+    query_options.add_argument("--json", action="store_true")
+    queries = query_parser.add_subparsers(dest="what", required=True)
+    search_parser = queries.add_parser("search", parents=[query_options], help="full text search")
+    search_parser.add_argument("terms", nargs="+")
+    search_parser.add_argument("--page", type=int, default=1)
+    queries.add_parser("city", parents=[query_options], help="news of a city, newest first").add_argument("city")
+    between_parser = queries.add_parser("between", parents=[query_options], help="news with start <= date < end")
+    between_parser.add_argument("start")
+    between_parser.add_argument("end")
+    queries.add_parser("latest", parents=[query_options], help="latest news")
+    queries.add_parser("near-duplicates", parents=[query_options], help="news flagged as near duplicates")
+    queries.add_parser("expiring", parents=[query_options],
+                       help="private ads expiring before a date").add_argument("date")
+    query_parser.set_defaults(handler=query_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
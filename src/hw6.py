@@ -2,6 +2,8 @@ import os
 import datetime
 import re
 import csv
+import json
+import zlib
 
 class Record:
     def __init__(self):
@@ -48,16 +50,118 @@ class CustomRecord(Record):
         return f"{self.record_type} | {self.data}\n"
 
 
+# FeedStatistics keeps running totals for the feed file so the CSVs don't need a full re-scan
+class FeedStatistics:
+    def __init__(self, filename, stats_file):
+        self.filename = filename
+        self.stats_file = stats_file
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.size = 0
+        self.checksum = 0
+        self.load()
+
+    @staticmethod
+    def count_line(line):
+        """Return word, letter and non-space character counts for a single feed line."""
+        line = line.strip().lower()
+        words = re.findall(r'\w+', line)
+        return len(words), len([char for char in line if char.isalpha()]), len(line.replace(" ", ""))
+
+    def feed_size(self):
+        return os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+
+    def load(self):
+        """Load saved totals, rebuilding them if they don't match the feed file."""
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r') as file:
+                    saved = json.load(file)
+                self.word_count = saved["word_count"]
+                self.letter_count = saved["letter_count"]
+                self.total_letters = saved["total_letters"]
+                self.size = saved["size"]
+                self.checksum = saved["checksum"]
+            except (ValueError, KeyError):
+                print(f"Statistics file '{self.stats_file}' is corrupted.")
+                self.size = -1
+
+        if self.size != self.feed_size() or self.calculate_checksum() != self.checksum:
+            self.rebuild()
+
+    def save(self):
+        tmp_file = self.stats_file + ".tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump({
+                "word_count": self.word_count,
+                "letter_count": self.letter_count,
+                "total_letters": self.total_letters,
+                "size": self.size,
+                "checksum": self.checksum,
+            }, file)
+        os.replace(tmp_file, self.stats_file)
+
+    def calculate_checksum(self):
+        checksum = 0
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                for line in file:
+                    checksum = zlib.crc32(line.encode('utf-8'), checksum)
+        return checksum
+
+    def rebuild(self):
+        """Recalculate all totals with a full scan of the feed file."""
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.checksum = 0
+
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                for line in file:
+                    self.add_counts(line)
+                    self.checksum = zlib.crc32(line.encode('utf-8'), self.checksum)
+
+        self.size = self.feed_size()
+        self.save()
+        print(f"statistics for '{self.filename}' rebuilt.")
+
+    def ensure_current(self):
+        """Rebuild the totals if the feed file was changed outside of this manager."""
+        if self.size != self.feed_size():
+            self.rebuild()
+
+    def add_counts(self, line):
+        words, letters, chars = self.count_line(line)
+        self.word_count += words
+        self.letter_count += letters
+        self.total_letters += chars
+
+    def add(self, text):
+        """Update the totals with text that was just appended to the feed file."""
+        for line in text.split('\n'):
+            self.add_counts(line)
+        self.checksum = zlib.crc32(text.encode('utf-8'), self.checksum)
+        self.size = self.feed_size()
+        self.save()
+
+
 class NewsFeedManager:
-    def __init__(self, filename="news_feed.txt", word_count_file="word-count.csv", letters_file="letters.csv"):
+    def __init__(self, filename="news_feed.txt", word_count_file="word-count.csv", letters_file="letters.csv",
+                 stats_file="feed-stats.json"):
         self.filename = filename
         self.word_count_file = word_count_file
         self.letters_file = letters_file
+        self.stats = FeedStatistics(filename, stats_file)
 
     def write_to_file(self, record):
+        self.stats.ensure_current()
+        formatted = record.format_record()
         with open(self.filename, "a") as file:
-            file.write(record.format_record())
+            file.write(formatted)
         print("Record added successfully.")
+        self.stats.add(formatted)
         self.recreate_csvs()
 
     def display_menu(self):
@@ -85,22 +189,13 @@ class NewsFeedManager:
         print(f"letters csv'{self.letters_file}' recreated.")
 
     def calculate_counts(self):
-        word_count = 0
-        letter_count = 0
-        total_letters = 0
-        
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r') as file:
-                lines = file.readlines()
-
-            for line in lines:
-                line = line.strip().lower()
-                words = re.findall(r'\w+', line)
-                word_count += len(words)
-                total_letters += len(line.replace(" ", ""))  
-                letter_count += len([char for char in line if char.isalpha()])
+        """Return the running totals, kept up to date on every append."""
+        return self.stats.word_count, self.stats.letter_count, self.stats.total_letters
 
-        return word_count, letter_count, total_letters
+    def rebuild_stats(self):
+        """Force a full re-scan of the feed file and recreate the CSVs."""
+        self.stats.rebuild()
+        self.recreate_csvs()
 
 class FileInputManager:
     def __init__(self, manager, default_folder="records"):
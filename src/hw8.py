@@ -3,6 +3,7 @@ import datetime
 import re
 import csv
 import json
+import zlib
 import xml.etree.ElementTree as ET
 
 class Record:
@@ -50,16 +51,118 @@ class CustomRecord(Record):
         return f"{self.record_type} | {self.data}\n"
 
 
+# FeedStatistics keeps running totals for the feed file so the CSVs don't need a full re-scan
+class FeedStatistics:
+    def __init__(self, filename, stats_file):
+        self.filename = filename
+        self.stats_file = stats_file
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.size = 0
+        self.checksum = 0
+        self.load()
+
+    @staticmethod
+    def count_line(line):
+        """Return word, letter and non-space character counts for a single feed line."""
+        line = line.strip().lower()
+        words = re.findall(r'\w+', line)
+        return len(words), len([char for char in line if char.isalpha()]), len(line.replace(" ", ""))
+
+    def feed_size(self):
+        return os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+
+    def load(self):
+        """Load saved totals, rebuilding them if they don't match the feed file."""
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r') as file:
+                    saved = json.load(file)
+                self.word_count = saved["word_count"]
+                self.letter_count = saved["letter_count"]
+                self.total_letters = saved["total_letters"]
+                self.size = saved["size"]
+                self.checksum = saved["checksum"]
+            except (ValueError, KeyError):
+                print(f"Statistics file '{self.stats_file}' is corrupted.")
+                self.size = -1
+
+        if self.size != self.feed_size() or self.calculate_checksum() != self.checksum:
+            self.rebuild()
+
+    def save(self):
+        tmp_file = self.stats_file + ".tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump({
+                "word_count": self.word_count,
+                "letter_count": self.letter_count,
+                "total_letters": self.total_letters,
+                "size": self.size,
+                "checksum": self.checksum,
+            }, file)
+        os.replace(tmp_file, self.stats_file)
+
+    def calculate_checksum(self):
+        checksum = 0
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                for line in file:
+                    checksum = zlib.crc32(line.encode('utf-8'), checksum)
+        return checksum
+
+    def rebuild(self):
+        """Recalculate all totals with a full scan of the feed file."""
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.checksum = 0
+
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                for line in file:
+                    self.add_counts(line)
+                    self.checksum = zlib.crc32(line.encode('utf-8'), self.checksum)
+
+        self.size = self.feed_size()
+        self.save()
+        print(f"statistics for '{self.filename}' rebuilt.")
+
+    def ensure_current(self):
+        """Rebuild the totals if the feed file was changed outside of this manager."""
+        if self.size != self.feed_size():
+            self.rebuild()
+
+    def add_counts(self, line):
+        words, letters, chars = self.count_line(line)
+        self.word_count += words
+        self.letter_count += letters
+        self.total_letters += chars
+
+    def add(self, text):
+        """Update the totals with text that was just appended to the feed file."""
+        for line in text.split('\n'):
+            self.add_counts(line)
+        self.checksum = zlib.crc32(text.encode('utf-8'), self.checksum)
+        self.size = self.feed_size()
+        self.save()
+
+
 class NewsFeedManager:
-    def __init__(self, filename="news_feed.txt", word_count_file="word-count.csv", letters_file="letters.csv"):
+    def __init__(self, filename="news_feed.txt", word_count_file="word-count.csv", letters_file="letters.csv",
+                 stats_file="feed-stats.json"):
         self.filename = filename
         self.word_count_file = word_count_file
         self.letters_file = letters_file
+        self.stats = FeedStatistics(filename, stats_file)
 
     def write_to_file(self, record):
+        self.stats.ensure_current()
+        formatted = record.format_record()
         with open(self.filename, "a") as file:
-            file.write(record.format_record())
+            file.write(formatted)
         print("Record added successfully.")
+        self.stats.add(formatted)
         self.recreate_csvs()
 
     def display_menu(self):
@@ -88,22 +191,13 @@ class NewsFeedManager:
         print(f"letters csv '{self.letters_file}' recreated.")
 
     def calculate_counts(self):
-        word_count = 0
-        letter_count = 0
-        total_letters = 0
-        
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r') as file:
-                lines = file.readlines()
-
-            for line in lines:
-                line = line.strip().lower()
-                words = re.findall(r'\w+', line)
-                word_count += len(words)
-                total_letters += len(line.replace(" ", ""))  
-                letter_count += len([char for char in line if char.isalpha()])
+        """Return the running totals, kept up to date on every append."""
+        return self.stats.word_count, self.stats.letter_count, self.stats.total_letters
 
-        return word_count, letter_count, total_letters
+    def rebuild_stats(self):
+        """Force a full re-scan of the feed file and recreate the CSVs."""
+        self.stats.rebuild()
+        self.recreate_csvs()
 
 
 class FileInputManager:
@@ -256,20 +350,37 @@ class XmlInputManager:
             print(f"File '{file_path}' does not exist.")
             return
 
+        # Check the whole file first, a parse error halfway would leave the records before it
+        # imported and the file in place, so importing it again would duplicate them
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
+            for _ in self.iter_records(file_path):
+                pass
         except ET.ParseError:
             print("Error: Invalid XML format.")
             return
-        
-        for record in root.findall('record'):
-            record_type = record.get('type', '').strip().lower()
-            self.process_record(record_type, record)
+
+        for record in self.iter_records(file_path):
+            self.process_record(self.record_type_of(record), record)
 
         os.remove(file_path)
         print(f"File '{file_path}' processed and removed successfully.")
 
+    def iter_records(self, file_path):
+        """Yield each <record> element as soon as it's closed, then clear it to keep memory flat."""
+        context = ET.iterparse(file_path, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event == "end" and element.tag == "record":
+                yield element
+                element.clear()
+                root.clear()
+
+    @staticmethod
+    def record_type_of(record):
+        """Read the record type from either a type= attribute or a <type> child element."""
+        record_type = record.get('type') or record.findtext('type') or ""
+        return record_type.strip().lower()
+
     def process_record(self, record_type, record):
         try:
             if record_type == "news":
@@ -291,7 +402,7 @@ class XmlInputManager:
                     print(f"Invalid Private Ad record: {ET.tostring(record, encoding='unicode')}")
 
             elif record_type == "custom record":
-                custom_fields = record.find('custom_fields').text.strip()
+                custom_fields = (record.findtext('custom_fields') or record.findtext('data') or "").strip()
                 if custom_fields:
                     custom_record = CustomRecord(record_type, custom_fields)
                     self.manager.write_to_file(custom_record)
@@ -1,63 +1,509 @@
 import os
+import math
 import datetime
 import re
-import csv
-import json
-import xml.etree.ElementTree as ET
-import sqlite3
+import string
+import array
+import hashlib
+import importlib
+import zlib
+import time
+import itertools
+from collections import Counter, deque
+
+# json, sqlite3, csv, mmap, threading, the compression modules, xml.etree and
+# concurrent.futures are imported where they're used, most runs (see feed_cli.py)
+# only need a few of them
+
+# Records created within the same second share one timestamp instead of formatting their own
+_timestamp_cache = {"second": None, "now": None, "formatted": None}
+
+
+def current_time():
+    """Return the current time truncated to seconds, cached for the whole second."""
+    second = int(time.time())
+    if _timestamp_cache["second"] != second:
+        now = datetime.datetime.fromtimestamp(second)
+        _timestamp_cache.update(second=second, now=now, formatted=now.strftime('%Y-%m-%d %H:%M:%S'))
+    return _timestamp_cache["now"]
+
+
+def current_timestamp():
+    current_time()
+    return _timestamp_cache["formatted"]
+
+
+# PipelineMetrics times the ingestion stages and counts what went through them
+class PipelineMetrics:
+    STAGES = ("parse", "dedupe", "file_append", "csv_rebuild", "db_insert", "commit")
+
+    def __init__(self):
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        # Per stage: number of calls, total seconds, slowest call
+        self.stages = {stage: [0, 0.0, 0.0] for stage in self.STAGES}
+        self.counters = Counter()
+
+    def observe(self, stage, seconds, calls=1):
+        timer = self.stages[stage]
+        timer[0] += calls
+        timer[1] += seconds
+        if seconds > timer[2]:
+            timer[2] = seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def start_profile(self):
+        """Start a cProfile capture, stop_profile writes it out."""
+        import cProfile
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self, path):
+        """Stop the cProfile capture and save it to path, to be read with pstats or snakeviz."""
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        self.profiler.dump_stats(path)
+        self.profiler = None
+        print(f"Profile saved to '{path}'.")
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "stages": {
+                stage: {"calls": calls, "seconds": round(total, 6), "max_seconds": round(slowest, 6),
+                        "avg_seconds": round(total / calls, 9) if calls else 0.0}
+                for stage, (calls, total, slowest) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP news_feed_stage_seconds_total Time spent in each ingestion stage.",
+            "# TYPE news_feed_stage_seconds_total counter",
+        ]
+        lines += [f'news_feed_stage_seconds_total{{stage="{stage}"}} {total:.6f}'
+                  for stage, (calls, total, slowest) in self.stages.items()]
+        lines += [
+            "# HELP news_feed_stage_calls_total Number of times each ingestion stage ran.",
+            "# TYPE news_feed_stage_calls_total counter",
+        ]
+        lines += [f'news_feed_stage_calls_total{{stage="{stage}"}} {calls}'
+                  for stage, (calls, total, slowest) in self.stages.items()]
+        lines += [
+            "# HELP news_feed_stage_max_seconds Slowest single run of each ingestion stage.",
+            "# TYPE news_feed_stage_max_seconds gauge",
+        ]
+        lines += [f'news_feed_stage_max_seconds{{stage="{stage}"}} {slowest:.6f}'
+                  for stage, (calls, total, slowest) in self.stages.items()]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE news_feed_{name}_total counter", f"news_feed_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def save(self, json_file=None, prometheus_file=None):
+        """Write the metrics as JSON and/or Prometheus text, replacing the files atomically."""
+        import json
+        for path, content in ((json_file, lambda: json.dumps(self.to_dict(), indent=2)),
+                              (prometheus_file, self.to_prometheus)):
+            if path:
+                tmp_file = path + ".tmp"
+                with open(tmp_file, 'w') as file:
+                    file.write(content())
+                os.replace(tmp_file, path)
+
+
+# Shared by the whole ingestion pipeline of this process
+metrics = PipelineMetrics()
+
+
+# Expiration dates repeat a lot in large ad imports, so each distinct value is parsed only once
+_expiration_dates = {}
+EXPIRATION_DATE_CACHE_SIZE = 100000
+
+
+def parse_expiration_date(value):
+    """Parse a 'YYYY-MM-DD' expiration date into a datetime, returns None if it isn't a valid date."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return _expiration_dates[value]
+    except KeyError:
+        pass
+
+    stripped = value.strip()
+    parsed = None
+    try:
+        if len(stripped) == 10 and stripped[4] == "-" and stripped[7] == "-":
+            parsed = datetime.datetime.combine(datetime.date.fromisoformat(stripped), datetime.time())
+        else:
+            # Slow path for dates without zero padding, like 2030-1-5
+            parsed = datetime.datetime.strptime(stripped, '%Y-%m-%d')
+    except ValueError:
+        pass
+
+    if len(_expiration_dates) < EXPIRATION_DATE_CACHE_SIZE:
+        _expiration_dates[value] = parsed
+    return parsed
+
 
 # Record base class
 class Record:
+    # Slots keep bulk imports small, the data string is only built when it's first needed
+    __slots__ = ("record_type", "_data", "_formatted")
+
     def __init__(self):
         self.record_type = ""
-        self.data = ""
+        self._data = None
+        self._formatted = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self.render_data()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._formatted = None
+
+    def render_data(self):
+        return ""
 
     def format_record(self):
-        return f"{self.record_type} | {self.data}\n"
+        if self._formatted is None:
+            self._formatted = f"{self.record_type} | {self.data}\n"
+        return self._formatted
+
+    def dedupe_key(self):
+        """Fields that identify the record, matching the UNIQUE constraint of its table."""
+        return self.record_type, self.data
 
 # News record type
 class News(Record):
-    def __init__(self, city, text):
+    __slots__ = ("city", "text", "date")
+
+    def __init__(self, city, text, date=None):
         super().__init__()
         self.record_type = "News"
         self.city = city
         self.text = text
-        self.date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.data = f"{self.date} | {self.city} | {self.text}"
+        self.date = date or current_timestamp()
 
-    def format_record(self):
-        return f"{self.record_type} | {self.data}\n"
+    def render_data(self):
+        return f"{self.date} | {self.city} | {self.text}"
+
+    def dedupe_key(self):
+        return "news", self.city, self.text
 
 # Private Ad record type
 class PrivateAd(Record):
+    __slots__ = ("text", "expiration_date")
+
     def __init__(self, text, expiration_date):
         super().__init__()
         self.record_type = "Private Ad"
         self.text = text
-        self.expiration_date = datetime.datetime.strptime(expiration_date, '%Y-%m-%d')
-        self.days_left = (self.expiration_date - datetime.datetime.now()).days
-        self.data = f"{self.text} | {self.expiration_date.strftime('%Y-%m-%d')} | {self.days_left} days left"
+        self.expiration_date = parse_expiration_date(expiration_date)
+        if self.expiration_date is None:
+            raise ValueError(f"Invalid expiration date '{expiration_date}', expected YYYY-MM-DD")
 
-    def format_record(self):
-        return f"{self.record_type} | {self.data}\n"
+    @property
+    def days_left(self):
+        """Days until the ad expires, computed when asked so it never goes stale."""
+        return (self.expiration_date - current_time()).days
+
+    def render_data(self):
+        return f"{self.text} | {self.expiration_date.strftime('%Y-%m-%d')} | {self.days_left} days left"
+
+    def dedupe_key(self):
+        return "private ad", self.text, self.expiration_date.strftime('%Y-%m-%d')
 
 # Custom record type
 class CustomRecord(Record):
+    __slots__ = ()
+
     def __init__(self, record_type, custom_fields):
         super().__init__()
         self.record_type = record_type
         self.data = custom_fields
 
-    def format_record(self):
-        return f"{self.record_type} | {self.data}\n"
+# BloomFilter answers "definitely not seen" without touching the database, false positives go to the exact check
+class BloomFilter:
+    MAGIC = b"NFBLOOM1"
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal size and number of hashes for `capacity` keys at `error_rate` false positives
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        # Highest row id known to be in the filter, rows after it are added when loading
+        self.last_id = 0
+        self.dirty = False
+
+    def positions(self, key):
+        # Two halves of one digest combined into hash_count positions (Kirsch and Mitzenmacher)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        for i in range(self.hash_count):
+            yield (first + i * second) % size
+
+    def add(self, key):
+        bits = self.bits
+        new = False
+        for position in self.positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        # Keys added again (or false positives) don't take any more room
+        if new:
+            self.count += 1
+            self.dirty = True
+
+    def __contains__(self, key):
+        # Stops at the first unset bit, which for a new key is usually the first or second one
+        bits = self.bits
+        for position in self.positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def save(self, path):
+        tmp_file = path + ".tmp"
+        with open(tmp_file, 'wb') as file:
+            file.write(self.MAGIC)
+            array.array('Q', [self.capacity, self.size, self.hash_count, self.count, self.last_id]).tofile(file)
+            file.write(self.bits)
+        os.replace(tmp_file, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved filter, returns None if the file is missing or damaged."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as file:
+            data = file.read()
+        header_size = len(cls.MAGIC) + 5 * 8
+        if data[:len(cls.MAGIC)] != cls.MAGIC or len(data) < header_size:
+            return None
+        capacity, size, hash_count, count, last_id = array.array('Q', data[len(cls.MAGIC):header_size])
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.size = size
+        bloom.hash_count = hash_count
+        bloom.count = count
+        bloom.last_id = last_id
+        bloom.dirty = False
+        bloom.bits = bytearray(data[header_size:])
+        if len(bloom.bits) != (size + 7) // 8:
+            return None
+        return bloom
+
+
+# NearDuplicateIndex finds news with almost the same text using MinHash signatures and LSH bands
+class NearDuplicateIndex:
+    NUM_PERM = 64
+    BANDS = 16  # 4 rows per band, news sharing a band become candidates from about 50% similarity
+    SHINGLE_SIZE = 2
+
+    def __init__(self, index_file, threshold=0.7):
+        self.index_file = index_file
+        self.threshold = threshold
+        self.rows = self.NUM_PERM // self.BANDS
+        self.signatures = {}
+        self.buckets = {}
+        self.pending = array.array('I')
+        self.last_id = 0
+
+    def signature(self, text):
+        """MinHash signature of the word shingles of a text."""
+        words = re.findall(r'\w+', text.lower())
+        size = min(self.SHINGLE_SIZE, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        # One shake_128 digest gives NUM_PERM independent 32-bit hashes of a shingle,
+        # much cheaper than NUM_PERM (a * x + b) % p permutations in Python
+        size = 4 * self.NUM_PERM
+        hashes = [array.array('I', hashlib.shake_128(shingle.encode('utf-8')).digest(size)) for shingle in shingles]
+        if len(hashes) == 1:
+            return hashes[0]
+        return array.array('I', map(min, *hashes))
+
+    def band_keys(self, signature):
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.BANDS)]
+
+    def find(self, signature):
+        """Return (id, similarity) of the most similar indexed news at or above the threshold, or None."""
+        candidates = set()
+        for key in self.band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best = None
+        for candidate in candidates:
+            other = self.signatures[candidate]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / self.NUM_PERM
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return best
+
+    def add(self, record_id, signature, persist=True):
+        self.signatures[record_id] = signature
+        for key in self.band_keys(signature):
+            self.buckets.setdefault(key, []).append(record_id)
+        self.last_id = max(self.last_id, record_id)
+        if persist:
+            self.pending.append(record_id)
+            self.pending.extend(signature)
+
+    def flush(self):
+        if self.pending:
+            with open(self.index_file, 'ab') as file:
+                self.pending.tofile(file)
+            self.pending = array.array('I')
+
+    def discard_pending(self):
+        """Forget the news added since the last flush."""
+        entry_size = self.NUM_PERM + 1
+        for start in range(0, len(self.pending), entry_size):
+            record_id = self.pending[start]
+            for key in self.band_keys(self.signatures.pop(record_id)):
+                self.buckets[key].remove(record_id)
+        self.pending = array.array('I')
+        self.last_id = max(self.signatures, default=0)
+
+    def load(self, cursor):
+        """Load the saved signatures and index the news added to the table since then."""
+        entry_size = self.NUM_PERM + 1
+        entries = array.array('I')
+        if os.path.exists(self.index_file) and os.path.getsize(self.index_file) % (entry_size * 4) == 0:
+            with open(self.index_file, 'rb') as file:
+                entries.frombytes(file.read())
+
+        cursor.execute("SELECT MAX(id) FROM news_records")
+        max_id = cursor.fetchone()[0] or 0
+        if entries and entries[-entry_size] > max_id:
+            # The database was recreated, the saved signatures belong to other news
+            entries = array.array('I')
+        if not entries and os.path.exists(self.index_file):
+            os.remove(self.index_file)
+
+        for start in range(0, len(entries), entry_size):
+            self.add(entries[start], entries[start + 1:start + entry_size], persist=False)
+
+        cursor.execute("SELECT id, text FROM news_records WHERE id > ? ORDER BY id", (self.last_id,))
+        missing = cursor.fetchall()
+        for record_id, text in missing:
+            self.add(record_id, self.signature(text or ""))
+        self.flush()
+        if missing:
+            print(f"near-duplicate index '{self.index_file}' updated with {len(missing)} news.")
+
 
 # DBManager for interacting with the database
 class DBManager:
-    def __init__(self, db_name="news_feed.db"):
+    # Duplicates are skipped by the UNIQUE constraint of each table
+    INSERT_QUERIES = {
+        'news_records': "INSERT OR IGNORE INTO news_records (date, city, text) VALUES (?, ?, ?)",
+        'private_ad_records': "INSERT OR IGNORE INTO private_ad_records (text, expiration_date) VALUES (?, ?)",
+        'custom_records': "INSERT OR IGNORE INTO custom_records (record_type, custom_fields) VALUES (?, ?)",
+    }
+
+    # PRAGMA settings per deployment, WAL lets readers work while the writer commits
+    PROFILES = {
+        'durable': {
+            'journal_mode': 'WAL',
+            'synchronous': 'FULL',
+        },
+        'balanced': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -65536,  # 64 MB
+            'mmap_size': 268435456,  # 256 MB
+            'temp_store': 'MEMORY',
+        },
+        'bulk-load': {
+            'journal_mode': 'WAL',
+            'synchronous': 'OFF',
+            'cache_size': -262144,  # 256 MB
+            'mmap_size': 1073741824,  # 1 GB
+            'temp_store': 'MEMORY',
+        },
+    }
+
+    # Columns of each table's UNIQUE constraint, these are the keys of its Bloom filter
+    UNIQUE_FIELDS = {
+        'news_records': ('city', 'text'),
+        'private_ad_records': ('text', 'expiration_date'),
+        'custom_records': ('record_type', 'custom_fields'),
+    }
+
+    FLAGGED_NEWS_QUERY = ("INSERT OR IGNORE INTO news_records (date, city, text, near_duplicate_of) "
+                          "VALUES (?, ?, ?, ?)")
+
+    # What to do with news that are near duplicates of an earlier one, off unless asked for
+    NEAR_DUPLICATE_ACTIONS = ("flag", "drop", "off")
+
+    def __init__(self, db_name="news_feed.db", profile="balanced", near_duplicates="off", similarity=0.7,
+                 bloom_filters=True, read_only=False):
+        import sqlite3
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown database profile '{profile}', expected one of {list(self.PROFILES)}")
+        if near_duplicates not in self.NEAR_DUPLICATE_ACTIONS:
+            raise ValueError(f"Unknown near duplicate action '{near_duplicates}', "
+                             f"expected one of {list(self.NEAR_DUPLICATE_ACTIONS)}")
         self.db_name = db_name
+        self.profile = profile
+        self.near_duplicate_action = near_duplicates
+        self.near_duplicates = None
+        self.blooms = {}
+        if read_only:
+            # Queries only read, so they skip the schema setup, the indexes and the Bloom filters
+            import pathlib
+            self.conn = sqlite3.connect(pathlib.Path(os.path.abspath(db_name)).as_uri() + "?mode=ro", uri=True)
+            self.cursor = self.conn.cursor()
+            return
         self.conn = sqlite3.connect(self.db_name)
         self.cursor = self.conn.cursor()
+        self.apply_profile()
         self.create_tables()
+        # The LSH index lives next to the database, e.g. news_feed.lsh for news_feed.db
+        if near_duplicates != "off":
+            self.add_near_duplicate_column()
+            self.near_duplicates = NearDuplicateIndex(os.path.splitext(db_name)[0] + ".lsh", similarity)
+            self.near_duplicates.load(self.cursor)
+        # Connections that never insert (sweeper, purge) leave the Bloom filter files alone
+        if bloom_filters:
+            self.load_bloom_filters()
+
+    def apply_profile(self):
+        """Apply the PRAGMA settings of the selected performance profile."""
+        for pragma, value in self.PROFILES[self.profile].items():
+            self.cursor.execute(f"PRAGMA {pragma} = {value}")
+
+    def has_near_duplicate_column(self):
+        self.cursor.execute("PRAGMA table_info(news_records)")
+        return "near_duplicate_of" in [column[1] for column in self.cursor.fetchall()]
+
+    def add_near_duplicate_column(self):
+        """Add the near_duplicate_of column the first time near duplicate detection is used."""
+        if not self.has_near_duplicate_column():
+            self.cursor.execute("ALTER TABLE news_records ADD COLUMN near_duplicate_of INTEGER")
+            self.conn.commit()
 
     def create_tables(self):
         """Create tables for each record type if they don't exist."""
@@ -76,7 +522,7 @@ class DBManager:
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             text TEXT,
             expiration_date TEXT,
-            days_left INTEGER,
+            days_left INTEGER,  -- no longer filled in, days left are computed when reading
             UNIQUE(text, expiration_date)
         )
         """)
@@ -90,123 +536,1662 @@ class DBManager:
         )
         """)
 
+        # Expired private ads are moved here, see purge_expired_ads
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS private_ad_records_archive (
+            id INTEGER PRIMARY KEY,
+            text TEXT,
+            expiration_date TEXT,
+            archived_at TEXT
+        )
+        """)
+
+        # Secondary indexes for the query methods, rowid is implicitly the last column of each
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_records_date ON news_records (date)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_records_city_date ON news_records (city, date)")
+        self.cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_private_ad_records_expiration_date ON private_ad_records (expiration_date)
+        """)
+
+        self.create_search_index()
         self.conn.commit()
 
+    # Tables covered by full-text search: kind, kind number, city column and text column.
+    # The search rowid is id * 3 + kind number, so triggers can find the row of a record directly.
+    SEARCH_SOURCES = [
+        ('news_records', 'news', 0, 'city', 'text'),
+        ('private_ad_records', 'private ad', 1, 'NULL', 'text'),
+        ('custom_records', 'custom record', 2, 'NULL', 'custom_fields'),
+    ]
+
+    def create_search_index(self):
+        """Create the FTS5 search table and the triggers that keep it in sync with the record tables."""
+        self.cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'records_fts'")
+        exists = self.cursor.fetchone()[0] > 0
+
+        self.cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+            kind UNINDEXED,
+            record_id UNINDEXED,
+            city,
+            text
+        )
+        """)
+
+        for table, kind, number, city, text in self.SEARCH_SOURCES:
+            new_city = city if city == 'NULL' else f"new.{city}"
+            insert = (f"INSERT INTO records_fts (rowid, kind, record_id, city, text) "
+                      f"VALUES (new.id * 3 + {number}, '{kind}', new.id, {new_city}, new.{text});")
+            delete = f"DELETE FROM records_fts WHERE rowid = old.id * 3 + {number};"
+            self.cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN {insert} END")
+            self.cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN {delete} END")
+            self.cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END")
+
+            # Records stored before the search table existed
+            if not exists:
+                self.cursor.execute(f"""
+                INSERT INTO records_fts (rowid, kind, record_id, city, text)
+                SELECT id * 3 + {number}, '{kind}', id, {city}, {text} FROM {table}
+                """)
+
+    def search(self, query, page=1, page_size=20, raw=False):
+        """Search record texts by keywords, best matches first.
+
+        Every word of the query has to match unless raw=True, in which case the
+        query is passed to FTS5 as is. Returns a list of dicts with the record
+        kind, id, city, a highlighted snippet and the bm25 rank.
+        """
+        if not raw:
+            query = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        if not query:
+            return []
+
+        self.cursor.execute("""
+        SELECT kind, record_id, city, snippet(records_fts, 3, '[', ']', '...', 12), bm25(records_fts)
+        FROM records_fts
+        WHERE records_fts MATCH ?
+        ORDER BY bm25(records_fts)
+        LIMIT ? OFFSET ?
+        """, (query, page_size, (page - 1) * page_size))
+        return [
+            {"kind": kind, "id": record_id, "city": city, "snippet": snippet, "rank": rank}
+            for kind, record_id, city, snippet, rank in self.cursor.fetchall()
+        ]
+
     def insert_record(self, record):
         """Insert a record into the appropriate table."""
+        self.insert_single_record(record)
+
+    def commit_insert(self, started):
+        """Commit an insert transaction that started at `started`.
+
+        The insert and the commit are timed as separate stages, one call per
+        transaction whether it holds a single record or a whole batch.
+        """
+        committing = time.perf_counter()
+        metrics.observe("db_insert", committing - started)
+        self.conn.commit()
+        metrics.observe("commit", time.perf_counter() - committing)
+
+    def insert_single_record(self, record):
+        import sqlite3
+        started = time.perf_counter()
         if isinstance(record, News):
             if not self.check_duplicate('news_records', ['city', 'text'], [record.city, record.text]):
-                self.cursor.execute("""
-                INSERT INTO news_records (date, city, text) VALUES (?, ?, ?)
-                """, (record.date, record.city, record.text))
-                self.conn.commit()
-                print(f"News record added: {record.format_record()}")
+                try:
+                    added = self.insert_news_rows([(record.date, record.city, record.text)])
+                    # executemany doesn't set lastrowid, so the id is read back
+                    record_id = self.row_id('news_records', (record.city, record.text)) if added else None
+                    self.commit_insert(started)
+                except sqlite3.Error:
+                    self.rollback()
+                    raise
+                self.flush_near_duplicates()
+                if added:
+                    self.remember('news_records', (record.city, record.text), record_id)
+                    print(f"News record added: {record.format_record()}")
             else:
                 print(f"Duplicate News record detected: {record.format_record()}")
 
         elif isinstance(record, PrivateAd):
             if not self.check_duplicate('private_ad_records', ['text', 'expiration_date'], [record.text, record.expiration_date]):
-                self.cursor.execute("""
-                INSERT INTO private_ad_records (text, expiration_date, days_left) VALUES (?, ?, ?)
-                """, (record.text, record.expiration_date, record.days_left))
-                self.conn.commit()
+                # OR IGNORE covers rows another process added after the Bloom filter was loaded
+                self.cursor.execute(self.INSERT_QUERIES['private_ad_records'], (record.text, record.expiration_date))
+                # An ignored insert leaves lastrowid at the row of an earlier insert
+                record_id = self.cursor.lastrowid if self.cursor.rowcount == 1 else None
+                self.commit_insert(started)
+                self.remember('private_ad_records', (record.text, record.expiration_date), record_id)
                 print(f"Private Ad record added: {record.format_record()}")
             else:
                 print(f"Duplicate Private Ad record detected: {record.format_record()}")
 
         elif isinstance(record, CustomRecord):
             if not self.check_duplicate('custom_records', ['record_type', 'custom_fields'], [record.record_type, record.data]):
-                self.cursor.execute("""
-                INSERT INTO custom_records (record_type, custom_fields) VALUES (?, ?)
-                """, (record.record_type, record.data))
-                self.conn.commit()
+                self.cursor.execute(self.INSERT_QUERIES['custom_records'], (record.record_type, record.data))
+                record_id = self.cursor.lastrowid if self.cursor.rowcount == 1 else None
+                self.commit_insert(started)
+                self.remember('custom_records', (record.record_type, record.data), record_id)
                 print(f"Custom record added: {record.format_record()}")
             else:
                 print(f"Duplicate Custom record detected: {record.format_record()}")
 
+    def row_id(self, table, values):
+        """Return the id of the row with the given UNIQUE constraint values, or None."""
+        condition = " AND ".join(f"{field} IS ?" for field in self.UNIQUE_FIELDS[table])
+        self.cursor.execute(f"SELECT id FROM {table} WHERE {condition}", values)
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def record_row(self, record):
+        """Return the table and column values for a record, or None for unsupported types."""
+        if isinstance(record, News):
+            return 'news_records', (record.date, record.city, record.text)
+        elif isinstance(record, PrivateAd):
+            return 'private_ad_records', (record.text, record.expiration_date)
+        elif isinstance(record, CustomRecord):
+            return 'custom_records', (record.record_type, record.data)
+        return None
+
+    def unique_key(self, record):
+        """Return the table and UNIQUE constraint values of a record, or None for unsupported types."""
+        if isinstance(record, News):
+            return 'news_records', (record.city, record.text)
+        elif isinstance(record, PrivateAd):
+            return 'private_ad_records', (record.text, record.expiration_date)
+        elif isinstance(record, CustomRecord):
+            return 'custom_records', (record.record_type, record.data)
+        return None
+
+    def insert_records(self, records, batch_size=500):
+        """Insert records in batches, committing once per batch.
+
+        Returns a tuple of (inserted, duplicates) counts.
+        """
+        inserted = 0
+        duplicates = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                added, skipped = self.insert_batch(batch)
+                inserted += added
+                duplicates += skipped
+                batch = []
+        if batch:
+            added, skipped = self.insert_batch(batch)
+            inserted += added
+            duplicates += skipped
+
+        print(f"{inserted} records added to the database, {duplicates} duplicates skipped.")
+        return inserted, duplicates
+
+    def insert_batch(self, batch):
+        """Insert one batch of records grouped per table in a single transaction."""
+        import sqlite3
+        rows = {}
+        for record in batch:
+            row = self.record_row(record)
+            if row is not None:
+                table, values = row
+                rows.setdefault(table, []).append(values)
+
+        # rowcount leaves out rows written by triggers, unlike total_changes
+        added = 0
+        # Every row between the MAX(id) before and after the inserts is from this batch,
+        # the write lock keeps other processes out for the whole transaction
+        inserted_ids = {}
+        started = time.perf_counter()
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute("BEGIN IMMEDIATE")
+            for table, values in rows.items():
+                self.cursor.execute(f"SELECT MAX(id) FROM {table}")
+                previous_id = self.cursor.fetchone()[0] or 0
+                if table == 'news_records' and self.near_duplicates is not None:
+                    table_added = self.insert_news_rows(values)
+                else:
+                    self.cursor.executemany(self.INSERT_QUERIES[table], values)
+                    table_added = self.cursor.rowcount
+                if table_added:
+                    self.cursor.execute(f"SELECT MAX(id) FROM {table}")
+                    inserted_ids[table] = (previous_id, self.cursor.fetchone()[0])
+                added += table_added
+            self.commit_insert(started)
+        except sqlite3.Error:
+            self.rollback()
+            metrics.count("db_errors")
+            raise
+        self.flush_near_duplicates()
+        for record in batch:
+            key = self.unique_key(record)
+            if key is not None:
+                self.remember(*key)
+        for table, (previous_id, last_id) in inserted_ids.items():
+            self.advance_bloom_filter(table, previous_id, last_id)
+
+        duplicates = sum(len(values) for values in rows.values()) - added
+        metrics.count("db_inserted", added)
+        metrics.count("db_duplicates", duplicates)
+        return added, duplicates
+
+    def insert_news_rows(self, values):
+        """Insert news, flagging or dropping near duplicates of earlier news.
+
+        News without a near duplicate still go in with one executemany, only
+        flagged ones are inserted one by one. Returns the number of inserted
+        news, the caller commits.
+        """
+        index = self.near_duplicates
+        if index is None:
+            self.cursor.executemany(self.INSERT_QUERIES['news_records'], values)
+            return self.cursor.rowcount
+
+        # Near duplicates within the batch are matched against the batch's own news too
+        batch_index = NearDuplicateIndex(None, index.threshold)
+        unmatched = []
+        matched = []
+        for position, (date, city, text) in enumerate(values):
+            signature = index.signature(text or "")
+            match = self.match_near_duplicate(signature, batch_index)
+            if match is None:
+                unmatched.append((date, city, text))
+                batch_index.add(position, signature, persist=False)
+                continue
+            if self.near_duplicate_action == "drop":
+                self.report_dropped(match, text)
+                continue
+            matched.append(((date, city, text), signature, match[0]))
+
+        if not self.conn.in_transaction:
+            self.cursor.execute("BEGIN IMMEDIATE")
+        self.cursor.execute("SELECT MAX(id) FROM news_records")
+        previous_id = self.cursor.fetchone()[0] or 0
+        self.cursor.executemany(self.INSERT_QUERIES['news_records'], unmatched)
+        added = self.cursor.rowcount
+
+        # The write lock is held, so every row after previous_id is one of ours
+        self.cursor.execute("SELECT id, city, text FROM news_records WHERE id > ?", (previous_id,))
+        ids = {(city, text): record_id for record_id, city, text in self.cursor.fetchall()}
+        for position, (date, city, text) in enumerate(values):
+            record_id = ids.get((city, text))
+            if record_id is not None and position in batch_index.signatures:
+                index.add(record_id, batch_index.signatures[position])
+
+        for (date, city, text), signature, original in matched:
+            if isinstance(original, tuple):
+                _, position = original
+                original = ids.get((values[position][1], values[position][2]))
+            self.cursor.execute(self.FLAGGED_NEWS_QUERY, (date, city, text, original))
+            if self.cursor.rowcount:
+                metrics.count("near_duplicates_flagged")
+                index.add(self.cursor.lastrowid, signature)
+                added += 1
+        return added
+
+    def match_near_duplicate(self, signature, batch_index):
+        """Return (id, similarity) of the news a signature is a near duplicate of, or None.
+
+        batch_index holds the news of the current batch that aren't in the table
+        yet, a match among them has a ("batch", position) id.
+        """
+        match = self.near_duplicates.find(signature)
+        if match is None:
+            batch_match = batch_index.find(signature)
+            if batch_match is not None:
+                match = (("batch", batch_match[0]), batch_match[1])
+        return match
+
+    @staticmethod
+    def report_dropped(match, text):
+        original, similarity = match
+        resembles = "an earlier news of this batch" if isinstance(original, tuple) else f"news #{original}"
+        metrics.count("near_duplicates_dropped")
+        print(f"Near duplicate News record dropped, {similarity:.0%} similar to {resembles}: {text}")
+
+    def flush_near_duplicates(self):
+        if self.near_duplicates is not None:
+            self.near_duplicates.flush()
+
+    def rollback(self):
+        self.conn.rollback()
+        if self.near_duplicates is not None:
+            # Ids of the rolled back news will be handed out again
+            self.near_duplicates.discard_pending()
+
+    def near_duplicate_news(self, limit=50, after=None):
+        """Return news flagged as near duplicates with the text they resemble, newest first."""
+        if not self.has_near_duplicate_column():
+            return []
+        if after is None:
+            return self.fetch_dicts("""
+            SELECT n.id, n.date, n.city, n.text, n.near_duplicate_of, o.text AS original_text
+            FROM news_records n JOIN news_records o ON o.id = n.near_duplicate_of
+            ORDER BY n.id DESC LIMIT ?
+            """, (limit,))
+        return self.fetch_dicts("""
+        SELECT n.id, n.date, n.city, n.text, n.near_duplicate_of, o.text AS original_text
+        FROM news_records n JOIN news_records o ON o.id = n.near_duplicate_of
+        WHERE n.id < ?
+        ORDER BY n.id DESC LIMIT ?
+        """, (after, limit))
+
+    def fetch_dicts(self, query, params):
+        self.cursor.execute(query, params)
+        columns = [column[0] for column in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    # Query methods page with a keyset: pass the (date, id) of the last row you got as
+    # `after` to get the next page, so deep pages cost the same as the first one.
+    def news_by_city(self, city, limit=50, after=None):
+        """Return news of a city, newest first."""
+        if after is None:
+            return self.fetch_dicts("""
+            SELECT id, date, city, text FROM news_records
+            WHERE city = ?
+            ORDER BY date DESC, id DESC LIMIT ?
+            """, (city, limit))
+        return self.fetch_dicts("""
+        SELECT id, date, city, text FROM news_records
+        WHERE city = ? AND (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC LIMIT ?
+        """, (city, after[0], after[1], limit))
+
+    def news_between(self, start, end, limit=50, after=None):
+        """Return news with start <= date < end, oldest first."""
+        if after is None:
+            return self.fetch_dicts("""
+            SELECT id, date, city, text FROM news_records
+            WHERE date >= ? AND date < ?
+            ORDER BY date, id LIMIT ?
+            """, (start, end, limit))
+        return self.fetch_dicts("""
+        SELECT id, date, city, text FROM news_records
+        WHERE date < ? AND (date, id) > (?, ?)
+        ORDER BY date, id LIMIT ?
+        """, (end, after[0], after[1], limit))
+
+    def latest_news(self, limit=50, after=None):
+        """Return the latest news, newest first."""
+        if after is None:
+            return self.fetch_dicts("""
+            SELECT id, date, city, text FROM news_records
+            ORDER BY date DESC, id DESC LIMIT ?
+            """, (limit,))
+        return self.fetch_dicts("""
+        SELECT id, date, city, text FROM news_records
+        WHERE (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC LIMIT ?
+        """, (after[0], after[1], limit))
+
+    def ads_expiring_before(self, date, limit=50, after=None):
+        """Return private ads that expire before a date, soonest first.
+
+        Here `after` is the (expiration_date, id) of the last row.
+        """
+        if after is None:
+            rows = self.fetch_dicts("""
+            SELECT id, text, expiration_date FROM private_ad_records
+            WHERE expiration_date < ?
+            ORDER BY expiration_date, id LIMIT ?
+            """, (date, limit))
+        else:
+            rows = self.fetch_dicts("""
+            SELECT id, text, expiration_date FROM private_ad_records
+            WHERE expiration_date < ? AND (expiration_date, id) > (?, ?)
+            ORDER BY expiration_date, id LIMIT ?
+            """, (date, after[0], after[1], limit))
+
+        now = current_time()
+        for row in rows:
+            row["days_left"] = (datetime.datetime.fromisoformat(row["expiration_date"]) - now).days
+        return rows
+
+    def purge_expired_ads(self, before=None, batch_size=1000):
+        """Move private ads that expired before a moment (now by default) to the archive table.
+
+        Ads are moved in batches of batch_size rows, one transaction per batch.
+        Returns the number of archived ads.
+        """
+        import sqlite3
+        if before is None:
+            before = current_timestamp()
+        archived_at = current_timestamp()
+        archived = 0
+        while True:
+            try:
+                # The batch is picked once, so the archived rows and the deleted rows are the same ones
+                if not self.conn.in_transaction:
+                    self.cursor.execute("BEGIN IMMEDIATE")
+                self.cursor.execute("""
+                SELECT id FROM private_ad_records
+                WHERE expiration_date < ?
+                ORDER BY expiration_date, id LIMIT ?
+                """, (before, batch_size))
+                ids = self.cursor.fetchall()
+                self.cursor.executemany("""
+                INSERT OR IGNORE INTO private_ad_records_archive (id, text, expiration_date, archived_at)
+                SELECT id, text, expiration_date, ? FROM private_ad_records WHERE id = ?
+                """, [(archived_at, record_id) for record_id, in ids])
+                self.cursor.executemany("DELETE FROM private_ad_records WHERE id = ?", ids)
+                moved = len(ids)
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            archived += moved
+            if moved < batch_size:
+                break
+
+        print(f"{archived} expired private ads archived.")
+        return archived
+
     def check_duplicate(self, table, fields, values):
         """Check if a record with the same fields already exists."""
+        bloom = self.blooms.get(table)
+        if bloom is not None and tuple(fields) == self.UNIQUE_FIELDS[table]:
+            if self.bloom_key(values) not in bloom:
+                # Most records are new, those never reach the database
+                metrics.count("bloom_skipped")
+                return False
+            metrics.count("bloom_checked")
+
         query = f"SELECT COUNT(*) FROM {table} WHERE " + " AND ".join([f"{field} = ?" for field in fields])
         self.cursor.execute(query, values)
         return self.cursor.fetchone()[0] > 0
 
+    @staticmethod
+    def bloom_key(values):
+        # str() of a datetime matches how sqlite3 stores it, so keys from records and rows agree
+        return "\x1f".join(str(value) for value in values)
+
+    def bloom_file(self, table):
+        return f"{os.path.splitext(self.db_name)[0]}.{table}.bloom"
+
+    def load_bloom_filters(self):
+        """Load the Bloom filter of each table, adding the rows inserted since it was saved."""
+        for table, fields in self.UNIQUE_FIELDS.items():
+            self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            rows = self.cursor.fetchone()[0]
+            # The AUTOINCREMENT counter survives deletes (e.g. purged ads), unlike MAX(id)
+            self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+            sequence = self.cursor.fetchone()
+            highest_id = sequence[0] if sequence else 0
+            bloom = BloomFilter.load(self.bloom_file(table))
+            # Rebuild if the table was recreated or has outgrown the filter
+            if bloom is None or bloom.last_id > highest_id or rows > bloom.capacity:
+                self.rebuild_bloom_filter(table, rows)
+                continue
+
+            self.cursor.execute(f"SELECT id, {', '.join(fields)} FROM {table} WHERE id > ?", (bloom.last_id,))
+            for row in self.cursor.fetchall():
+                bloom.add(self.bloom_key(row[1:]))
+                bloom.last_id = max(bloom.last_id, row[0])
+            self.blooms[table] = bloom
+
+    def rebuild_bloom_filter(self, table, rows=0):
+        """Recreate a table's Bloom filter from its rows, sized for twice as many."""
+        fields = self.UNIQUE_FIELDS[table]
+        bloom = BloomFilter(capacity=max(100000, rows * 2))
+        self.cursor.execute(f"SELECT id, {', '.join(fields)} FROM {table}")
+        for row in self.cursor:
+            bloom.add(self.bloom_key(row[1:]))
+            bloom.last_id = max(bloom.last_id, row[0])
+        bloom.save(self.bloom_file(table))
+        self.blooms[table] = bloom
+        if rows:
+            print(f"Bloom filter for '{table}' rebuilt from {rows} rows.")
+
+    def remember(self, table, values, record_id=None):
+        """Add an inserted record to its table's Bloom filter."""
+        bloom = self.blooms.get(table)
+        if bloom is None:
+            return
+        bloom.add(self.bloom_key(values))
+        if record_id is not None:
+            self.advance_bloom_filter(table, record_id - 1, record_id)
+        if bloom.count > bloom.capacity:
+            self.rebuild_bloom_filter(table, bloom.count)
+
+    def advance_bloom_filter(self, table, previous_id, last_id):
+        """Mark the rows after previous_id up to last_id as covered by the filter.
+
+        Only done when they directly follow the covered rows, rows of other
+        processes in between are picked up on the next load instead.
+        """
+        bloom = self.blooms.get(table)
+        if bloom is not None and previous_id <= bloom.last_id < last_id:
+            bloom.last_id = last_id
+            bloom.dirty = True
+
+    def save_bloom_filters(self):
+        for table, bloom in self.blooms.items():
+            if bloom.dirty:
+                bloom.save(self.bloom_file(table))
+
     def close(self):
         """Close the database connection."""
+        self.save_bloom_filters()
+        # Open cursor would keep the WAL from being checkpointed into the database file
+        self.cursor.close()
         self.conn.close()
 
+# ExpiredAdSweeper archives expired private ads in the background
+class ExpiredAdSweeper:
+    def __init__(self, db_name="news_feed.db", interval=3600, batch_size=1000, db_profile="balanced"):
+        import threading
+        self.db_name = db_name
+        self.interval = interval
+        self.batch_size = batch_size
+        self.db_profile = db_profile
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        import sqlite3
+        # SQLite connections belong to the thread that opened them; the sweeper
+        # only deletes ads, so it skips the near duplicate index and the Bloom filters
+        db_manager = DBManager(self.db_name, self.db_profile, near_duplicates="off", bloom_filters=False)
+        try:
+            while not self.stopped.is_set():
+                try:
+                    db_manager.purge_expired_ads(batch_size=self.batch_size)
+                except sqlite3.Error as e:
+                    print(f"Error purging expired private ads: {e}")
+                self.stopped.wait(self.interval)
+        finally:
+            db_manager.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+# FeedStatistics keeps running totals for the feed file so the CSVs don't need a full re-scan
+class FeedStatistics:
+    BLOCK_SIZE = 4 * 1024 * 1024  # characters of the feed counted at once
+    NON_WORD_BYTES = bytes(sorted(set(range(256)).difference((string.ascii_letters + string.digits + "_").encode('ascii'))))
+    # Maps every byte that can't be part of an ASCII \w+ word to a space
+    NON_WORD_TO_SPACE = bytes.maketrans(NON_WORD_BYTES, b" " * len(NON_WORD_BYTES))
+    OTHER_WHITESPACE = re.compile(r'[^\S \n]')
+    OTHER_WHITESPACE_BYTES = b"\t\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+    def __init__(self, filename, stats_file):
+        self.filename = filename
+        self.stats_file = stats_file
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.words = Counter()
+        self.letters = Counter()
+        self.size = 0
+        self.checksum = 0
+        self.stale_on_load = False
+        self.dirty = False  # added to since the last save
+        self.load()
+
+    def feed_size(self):
+        return os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+
+    def load(self):
+        """Load saved totals, rebuilding them if they don't match the feed file."""
+        import json
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r') as file:
+                    saved = json.load(file)
+                self.word_count = saved["word_count"]
+                self.letter_count = saved["letter_count"]
+                self.total_letters = saved["total_letters"]
+                self.words = Counter(saved["words"])
+                self.letters = Counter(saved["letters"])
+                self.size = saved["size"]
+                self.checksum = saved["checksum"]
+            except (ValueError, KeyError):
+                print(f"Statistics file '{self.stats_file}' is outdated or corrupted.")
+                self.size = -1
+
+        if self.size != self.feed_size() or self.calculate_checksum() != self.checksum:
+            self.stale_on_load = True
+            self.rebuild()
+
+    def save(self):
+        import json
+        tmp_file = self.stats_file + ".tmp"
+        # json.dumps uses the C encoder, json.dump to a file doesn't
+        with open(tmp_file, 'w') as file:
+            file.write(json.dumps({
+                "word_count": self.word_count,
+                "letter_count": self.letter_count,
+                "total_letters": self.total_letters,
+                "words": self.words,
+                "letters": self.letters,
+                "size": self.size,
+                "checksum": self.checksum,
+            }))
+        os.replace(tmp_file, self.stats_file)
+        self.dirty = False
+
+    def read_blocks(self):
+        """Yield the feed file in blocks of about BLOCK_SIZE characters that end on a line break."""
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                while True:
+                    block = file.read(self.BLOCK_SIZE)
+                    if not block:
+                        break
+                    yield block + file.readline()
+
+    def calculate_checksum(self):
+        checksum = 0
+        for block in self.read_blocks():
+            checksum = zlib.crc32(block.encode('utf-8'), checksum)
+        return checksum
+
+    def rebuild(self):
+        """Recalculate all totals with a full scan of the feed file."""
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.words = Counter()
+        self.letters = Counter()
+        self.checksum = 0
+
+        for block in self.read_blocks():
+            self.add_text(block)
+            self.checksum = zlib.crc32(block.encode('utf-8'), self.checksum)
+
+        self.size = self.feed_size()
+        self.save()
+        print(f"statistics for '{self.filename}' rebuilt.")
+
+    def ensure_current(self):
+        """Rebuild the totals if the feed file was changed outside of this manager."""
+        if self.size != self.feed_size():
+            self.rebuild()
+            return True
+        return False
+
+    def add_text(self, text):
+        """Add whole feed lines to the totals and frequencies.
+
+        The text is counted as one block with bulk string operations, which gives
+        the same numbers as stripping, lower-casing and counting it line by line.
+        """
+        text = text.lower()
+        if text.isascii():
+            # Bytes translate + split is much faster than the regex for plain ASCII feeds
+            data = text.encode('ascii')
+            words = Counter(data.translate(self.NON_WORD_TO_SPACE).decode('ascii').split())
+            other_whitespace = len(data.translate(None, self.OTHER_WHITESPACE_BYTES)) != len(data)
+        else:
+            words = Counter(re.findall(r'\w+', text))
+            other_whitespace = self.OTHER_WHITESPACE.search(text) is not None
+
+        # Letters are always part of a word: words seen equally often are joined
+        # and counted at once, then weighted by how often they were seen
+        words_by_count = {}
+        for word, count in words.items():
+            words_by_count.setdefault(count, []).append(word)
+        letters = Counter()
+        for count, group in words_by_count.items():
+            for char, seen in Counter("".join(group)).items():
+                if char.isalpha():
+                    letters[char] += seen * count
+
+        self.words.update(words)
+        self.letters.update(letters)
+        self.word_count += sum(words.values())
+        self.letter_count += sum(letters.values())
+        if other_whitespace:
+            # Whitespace other than spaces is only dropped at the ends of a line
+            self.total_letters += sum(len(line.strip().replace(" ", "")) for line in text.split('\n'))
+        else:
+            self.total_letters += len(text) - text.count(" ") - text.count("\n")
+
+    def add(self, text, size):
+        """Update the totals with text appended to the feed file, call save() to persist them."""
+        self.add_text(text)
+        self.checksum = zlib.crc32(text.encode('utf-8'), self.checksum)
+        self.size = size
+        self.dirty = True
+
+
+# DigestIndex keeps content digests of the records already written to the feed file
+class DigestIndex:
+    def __init__(self, filename, index_file):
+        self.filename = filename
+        self.index_file = index_file
+        self.digests = set()
+        self.pending = []
+        self.load()
+
+    @staticmethod
+    def digest(key):
+        # str() like the feed line does, so a missing (None) field gets the digest it has after a rebuild
+        return hashlib.blake2b("\x1f".join(str(part) for part in key).encode('utf-8'), digest_size=16).hexdigest()
+
+    @staticmethod
+    def key_from_line(line):
+        """Build the dedupe key of a record from its line in the feed file."""
+        parts = [item.strip() for item in line.strip().split(' | ')]
+        record_type = parts[0].lower()
+        if record_type == "news" and len(parts) >= 4:
+            return "news", parts[2], " | ".join(parts[3:])
+        if record_type == "private ad" and len(parts) >= 3:
+            return "private ad", parts[1], parts[2]
+        if len(parts) >= 2:
+            return parts[0], " | ".join(parts[1:])
+        return None
+
+    def load(self):
+        """Load the index once, rebuilding it from the feed file if it's missing."""
+        if not os.path.exists(self.index_file):
+            self.rebuild()
+            return
+        with open(self.index_file, 'r') as file:
+            self.digests = {line.strip() for line in file if line.strip()}
+
+    def rebuild(self):
+        """Recreate the index with a full scan of the feed file."""
+        self.digests = set()
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as file:
+                for line in file:
+                    key = self.key_from_line(line)
+                    if key is not None:
+                        self.digests.add(self.digest(key))
+
+        with open(self.index_file, 'w') as file:
+            file.writelines(f"{digest}\n" for digest in self.digests)
+        self.pending = []
+        print(f"duplicate index for '{self.filename}' rebuilt.")
+
+    def contains(self, record):
+        return self.digest(record.dedupe_key()) in self.digests
+
+    def add(self, record):
+        digest = self.digest(record.dedupe_key())
+        if digest not in self.digests:
+            self.digests.add(digest)
+            self.pending.append(digest)
+
+    def flush(self):
+        """Save the digests of the records added since the last flush, after they reach the feed file."""
+        if self.pending:
+            with open(self.index_file, 'a') as file:
+                file.writelines(f"{digest}\n" for digest in self.pending)
+            self.pending = []
+
+    def discard_pending(self, start=0):
+        """Forget the digests added after the first `start` pending ones, their records never reached the feed."""
+        for digest in self.pending[start:]:
+            self.digests.discard(digest)
+        del self.pending[start:]
+
+
+# OffsetIndex stores the byte offset where each record of the feed file starts, 8 bytes per record
+class OffsetIndex:
+    def __init__(self, filename, index_file):
+        self.filename = filename
+        self.index_file = index_file
+        self.pending = array.array('Q')
+        self.load()
+
+    def load(self):
+        """Rebuild the index if it's missing or doesn't end at the last record of the feed file."""
+        feed_size = os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+        if not os.path.exists(self.index_file) or os.path.getsize(self.index_file) % 8:
+            self.rebuild()
+            return
+
+        index_size = os.path.getsize(self.index_file)
+        if index_size == 0:
+            if feed_size > 0:
+                self.rebuild()
+            return
+
+        with open(self.index_file, 'rb') as file:
+            file.seek(-8, os.SEEK_END)
+            last = array.array('Q', file.read(8))[0]
+        if last >= feed_size:
+            self.rebuild()
+            return
+        # The last indexed record has to be the last line of the feed
+        with open(self.filename, 'rb') as file:
+            file.seek(last)
+            if b"\n" in file.read().rstrip(b"\n"):
+                self.rebuild()
+
+    def rebuild(self):
+        """Recreate the index with a full scan of the feed file."""
+        offsets = array.array('Q')
+        if os.path.exists(self.filename):
+            with open(self.filename, 'rb') as file:
+                position = 0
+                for line in file:
+                    offsets.append(position)
+                    position += len(line)
+        with open(self.index_file, 'wb') as file:
+            offsets.tofile(file)
+        self.pending = array.array('Q')
+        print(f"offset index for '{self.filename}' rebuilt.")
+
+    def append(self, offset):
+        self.pending.append(offset)
+
+    def flush(self):
+        if self.pending:
+            with open(self.index_file, 'ab') as file:
+                self.pending.tofile(file)
+            self.pending = array.array('Q')
+
+    def discard_pending(self, start=0):
+        del self.pending[start:]
+
+
+# FeedReader gives random access to the records of the feed file through its offset index
+class FeedReader:
+    def __init__(self, filename, index_file):
+        self.maps = []
+        self.feed = self.map_file(filename)
+        offsets = self.map_file(index_file)
+        self.offsets = memoryview(offsets).cast('Q') if offsets is not None else memoryview(array.array('Q'))
+        # Only count records that are completely in the file
+        self.count = len(self.offsets)
+        feed_size = len(self.feed) if self.feed is not None else 0
+        while self.count and self.offsets[self.count - 1] >= feed_size:
+            self.count -= 1
+
+    def map_file(self, path):
+        import mmap
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps.append(mapped)
+        return mapped
+
+    def __len__(self):
+        return self.count
+
+    def record(self, number):
+        """Return record number `number` (negative numbers count from the end) without its newline."""
+        if number < 0:
+            number += self.count
+        if not 0 <= number < self.count:
+            raise IndexError(f"record {number} is out of range, the feed has {self.count} records")
+        start = self.offsets[number]
+        end = self.offsets[number + 1] if number + 1 < self.count else len(self.feed)
+        return self.feed[start:end].decode('utf-8').rstrip('\n')
+
+    def records(self, start=0, stop=None):
+        """Iterate the records from start up to (not including) stop."""
+        stop = self.count if stop is None else min(stop, self.count)
+        for number in range(max(start, 0), stop):
+            yield self.record(number)
+
+    def tail(self, count):
+        """Return the last `count` records, oldest first."""
+        return list(self.records(max(self.count - count, 0)))
+
+    def close(self):
+        self.offsets.release()
+        for mapped in self.maps:
+            mapped.close()
+        self.maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# FeedWriter keeps the feed file open and coalesces appends into larger writes
+class FeedWriter:
+    POLICIES = ("record", "batch", "interval")
+
+    def __init__(self, filename, policy="batch", interval=1.0, use_fsync=False, buffer_size=65536, offsets=None,
+                 digests=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown write policy '{policy}', expected one of {self.POLICIES}")
+        self.filename = filename
+        self.policy = policy
+        self.interval = interval
+        self.use_fsync = use_fsync
+        self.buffer_size = buffer_size
+        self.offsets = offsets  # OffsetIndex that gets the start of every write
+        # DigestIndex saved only after the feed write, so a crash can't leave digests of lost records
+        self.digests = digests
+        self.file = None
+        self.pending = []
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+        # Where the open batch starts in the pending appends, offsets and digests; None outside a batch
+        self.batch_start = None
+
+    def size(self):
+        """Size of the feed file including appends that are not flushed yet."""
+        file_size = os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+        return file_size + self.pending_size
+
+    def write(self, text):
+        """Queue text for appending, returns the size of the feed file including it."""
+        data = text.encode('utf-8')
+        position = self.size()
+        if self.offsets is not None:
+            self.offsets.append(position)
+        self.pending.append(data)
+        self.pending_size += len(data)
+
+        if self.batch_start is None:
+            self.flush_if_due()
+        return position + len(data)
+
+    def flush_if_due(self):
+        if (self.policy == "record" or self.pending_size >= self.buffer_size
+                or (self.policy == "interval" and time.monotonic() - self.last_flush >= self.interval)):
+            self.flush()
+
+    def begin(self):
+        """Start a batch, its appends are held back until commit() and dropped by discard()."""
+        self.batch_start = (len(self.pending), self.pending_size,
+                            len(self.offsets.pending) if self.offsets is not None else 0,
+                            len(self.digests.pending) if self.digests is not None else 0)
+
+    def commit(self):
+        """End the batch, its appends are flushed like any other from now on."""
+        self.batch_start = None
+        self.flush_if_due()
+
+    def discard(self):
+        """End the batch and drop its appends along with their offsets and digests."""
+        pending, pending_size, offsets, digests = self.batch_start
+        self.batch_start = None
+        del self.pending[pending:]
+        self.pending_size = pending_size
+        if self.offsets is not None:
+            self.offsets.discard_pending(offsets)
+        if self.digests is not None:
+            self.digests.discard_pending(digests)
+
+    def flush(self):
+        """Write out the pending appends, with fsync if the policy asks for it."""
+        if self.pending:
+            if self.file is None:
+                self.file = open(self.filename, 'ab')
+            self.file.write(b"".join(self.pending))
+            self.file.flush()
+            if self.use_fsync:
+                os.fsync(self.file.fileno())
+            self.pending = []
+            self.pending_size = 0
+        if self.offsets is not None:
+            self.offsets.flush()
+        if self.digests is not None:
+            self.digests.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # A batch that failed halfway never reaches the file
+        if self.batch_start is not None:
+            self.discard()
+        self.flush()
+
+
+# FeedSnapshot is a columnar binary copy of the feed file for analytics.
+# Layout: magic, UTF-8 text blob, 8-byte aligned columns, JSON footer, footer length, magic.
+class FeedSnapshot:
+    MAGIC = b"NFSNAP02"  # 02: type column widened from B to I
+    # name: array typecode, the text column points into the text blob
+    COLUMNS = {
+        "type": "I",  # index into the types list of the footer
+        "day": "i",  # days since 1970-01-01 of the news date / ad expiration, -1 if none
+        "timestamp": "q",  # seconds since 1970-01-01 (dates are stored without a time zone), -1 if none
+        "city": "i",  # index into the cities list of the footer, -1 if none
+        "text_offset": "Q",
+        "text_length": "I",
+    }
+
+    def __init__(self, path):
+        import json
+        import mmap
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        tail = len(self.MAGIC) + 8
+        if self.map[:len(self.MAGIC)] != self.MAGIC or self.map[-len(self.MAGIC):] != self.MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a feed snapshot")
+        footer_length = int.from_bytes(self.map[-tail:-len(self.MAGIC)], 'little')
+        self.footer = json.loads(self.map[-tail - footer_length:-tail].decode('utf-8'))
+        self.count = self.footer["count"]
+        self.types = self.footer["types"]
+        self.cities = self.footer["cities"]
+        self.view = memoryview(self.map)
+
+    @staticmethod
+    def parse_line(line):
+        """Split a feed line into (type, date, city, text), with None for the missing parts."""
+        parts = line.rstrip('\n').split(' | ')
+        record_type = parts[0].strip()
+        kind = record_type.lower()
+        if kind == "news" and len(parts) >= 4:
+            return record_type, parts[1], parts[2], " | ".join(parts[3:])
+        if kind == "private ad" and len(parts) >= 3:
+            return record_type, parts[2], None, parts[1]
+        return record_type, None, None, " | ".join(parts[1:])
+
+    @classmethod
+    def export(cls, feed_paths, path):
+        """Write a snapshot of one or more feed files in order, returns the number of records in it."""
+        import json
+        if isinstance(feed_paths, str):
+            feed_paths = [feed_paths]
+        columns = {name: array.array(typecode) for name, typecode in cls.COLUMNS.items()}
+        types = {}
+        cities = {}
+        epoch = datetime.datetime(1970, 1, 1)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as out:
+            out.write(cls.MAGIC)
+            offset = out.tell()
+            for feed_path in feed_paths:
+                if os.path.exists(feed_path):
+                    with open(feed_path, 'r') as feed:
+                        for line in feed:
+                            if not line.strip():
+                                continue
+                            record_type, date, city, text = cls.parse_line(line)
+                            columns["type"].append(types.setdefault(record_type, len(types)))
+                            try:
+                                seconds = int((datetime.datetime.fromisoformat(date) - epoch).total_seconds())
+                            except (TypeError, ValueError):
+                                seconds = -1
+                            columns["timestamp"].append(seconds)
+                            columns["day"].append(seconds // 86400 if seconds >= 0 else -1)
+                            columns["city"].append(cities.setdefault(city, len(cities)) if city else -1)
+                            data = text.encode('utf-8')
+                            out.write(data)
+                            columns["text_offset"].append(offset)
+                            columns["text_length"].append(len(data))
+                            offset += len(data)
+
+            layout = {}
+            for name, column in columns.items():
+                out.write(b"\0" * (-out.tell() % 8))
+                layout[name] = out.tell()
+                column.tofile(out)
+
+            footer = json.dumps({
+                "count": len(columns["type"]),
+                "columns": layout,
+                "types": list(types),
+                "cities": list(cities),
+            }).encode('utf-8')
+            out.write(footer)
+            out.write(len(footer).to_bytes(8, 'little'))
+            out.write(cls.MAGIC)
+        os.replace(tmp_path, path)
+        return len(columns["type"])
+
+    def column(self, name):
+        """Return a column as a zero-copy memoryview over the mapped file."""
+        typecode = self.COLUMNS[name]
+        start = self.footer["columns"][name]
+        size = array.array(typecode).itemsize
+        return self.view[start:start + self.count * size].cast(typecode)
+
+    def text(self, index):
+        offset = self.column("text_offset")[index]
+        return self.map[offset:offset + self.column("text_length")[index]].decode('utf-8')
+
+    def counts_by_type(self):
+        return {self.types[code]: count for code, count in Counter(self.column("type")).items()}
+
+    def counts_by_city(self):
+        return {self.cities[code]: count for code, count in Counter(self.column("city")).items() if code >= 0}
+
+    def counts_by_day(self, record_type="News"):
+        """Count records of one type per day, e.g. news per day."""
+        code = self.types.index(record_type) if record_type in self.types else -1
+        counts = Counter(day for kind, day in zip(self.column("type"), self.column("day")) if kind == code and day >= 0)
+        epoch = datetime.date(1970, 1, 1)
+        return {(epoch + datetime.timedelta(days=day)).isoformat(): count for day, count in sorted(counts.items())}
+
+    def close(self):
+        # Views into the map have to be released before it can be closed
+        if getattr(self, "view", None) is not None:
+            self.view.release()
+            self.view = None
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# FeedSegments keeps closed parts of the feed file together with their precomputed
+# statistics and digests, so only the open part ever has to be scanned again
+class FeedSegments:
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_file = os.path.join(folder, "manifest.json")
+        self.segments = []
+        self.open_since = None
+        self.word_count = 0
+        self.letter_count = 0
+        self.total_letters = 0
+        self.words = Counter()
+        self.letters = Counter()
+        self.digests = set()
+        self.load()
+
+    def load(self):
+        """Load the manifest and the summaries of all closed segments."""
+        import json
+        if not os.path.exists(self.manifest_file):
+            return
+        with open(self.manifest_file, 'r') as file:
+            manifest = json.load(file)
+        self.open_since = manifest["open_since"]
+        for segment in manifest["segments"]:
+            with open(os.path.join(self.folder, segment["summary"]), 'r') as file:
+                summary = json.load(file)
+            with open(os.path.join(self.folder, segment["digests"]), 'r') as file:
+                digests = {line.strip() for line in file if line.strip()}
+            self.add_summary(segment, summary, digests)
+
+    def save(self):
+        import json
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, 'w') as file:
+            file.write(json.dumps({"open_since": self.open_since, "segments": self.segments}, indent=2))
+        os.replace(tmp_file, self.manifest_file)
+
+    def add_summary(self, segment, summary, digests):
+        self.segments.append(segment)
+        self.word_count += summary["word_count"]
+        self.letter_count += summary["letter_count"]
+        self.total_letters += summary["total_letters"]
+        self.words.update(summary["words"])
+        self.letters.update(summary["letters"])
+        self.digests.update(digests)
+
+    def paths(self):
+        return [os.path.join(self.folder, segment["file"]) for segment in self.segments]
+
+    def contains(self, record):
+        return DigestIndex.digest(record.dedupe_key()) in self.digests
+
+    def close_segment(self, filename, stats, digests):
+        """Move the open feed file into a new closed segment along with its summary and digests."""
+        import json
+        os.makedirs(self.folder, exist_ok=True)
+        name = f"segment-{len(self.segments) + 1:06d}"
+        segment = {
+            "file": name + ".txt",
+            "summary": name + ".summary.json",
+            "digests": name + ".digests",
+            "size": stats.size,
+            "opened": self.open_since,
+            "closed": time.time(),
+        }
+        summary = {
+            "word_count": stats.word_count,
+            "letter_count": stats.letter_count,
+            "total_letters": stats.total_letters,
+            "words": stats.words,
+            "letters": stats.letters,
+            "checksum": stats.checksum,
+        }
+
+        os.replace(filename, os.path.join(self.folder, segment["file"]))
+        with open(os.path.join(self.folder, segment["summary"]), 'w') as file:
+            file.write(json.dumps(summary))
+        with open(os.path.join(self.folder, segment["digests"]), 'w') as file:
+            file.writelines(f"{digest}\n" for digest in digests.digests)
+
+        self.add_summary(segment, summary, digests.digests)
+        self.open_since = None
+        self.save()
+        print(f"Feed segment '{segment['file']}' closed.")
+
+
 # NewsFeedManager handles the file and database integration
 class NewsFeedManager:
-    def __init__(self, filename="news_feed.txt", word_count_file="word-count.csv", letters_file="letters.csv"):
+    def __init__(self, filename="news_feed.txt", word_count_file="word-count.csv", letters_file="letters.csv",
+                 stats_file="feed-stats.json", index_file="feed-digests.idx", offsets_file="feed-offsets.idx",
+                 write_policy="batch", flush_interval=1.0, use_fsync=False, db_profile="balanced",
+                 csv_top_k=1000, segments_folder="news_feed_segments", segment_size=None, segment_age=None,
+                 metrics_file=None, prometheus_file=None, profile_file=None,
+                 near_duplicates="off", similarity=0.7):
         self.filename = filename
+        # Metrics are exported after every write when these are set, see PipelineMetrics
+        self.metrics_file = metrics_file
+        self.prometheus_file = prometheus_file
+        self.profile_file = profile_file
+        if profile_file:
+            metrics.start_profile()
         self.word_count_file = word_count_file
         self.letters_file = letters_file
-        self.db_manager = DBManager()  # Initialize the DBManager here
+        # Keep only the k most frequent words and letters in the CSVs, None keeps all of them
+        self.csv_top_k = csv_top_k
+        # The feed file is the open segment, it's closed once it reaches segment_size bytes
+        # or is segment_age seconds old; None means no limit
+        self.segment_size = segment_size
+        self.segment_age = segment_age
+        self.segments = FeedSegments(segments_folder)
+        self.stats = FeedStatistics(filename, stats_file)
+        self.digests = DigestIndex(filename, index_file)
+        if self.stats.stale_on_load:
+            # Feed file changed while no manager was running
+            self.digests.rebuild()
+        self.offsets_file = offsets_file
+        self.offsets = OffsetIndex(filename, offsets_file)
+        self.writer = FeedWriter(filename, write_policy, flush_interval, use_fsync, offsets=self.offsets,
+                                 digests=self.digests)
+        # Lines of the open batch, they're added to the statistics once the batch is in the database
+        self.uncommitted = []
+        self.uncommitted_size = 0
+        self.near_duplicates_dropped = 0
+        # The database is opened on first use, so runs that never touch it don't pay for it
+        self.db_profile = db_profile
+        self.near_duplicates = near_duplicates
+        self.similarity = similarity
+        self._db_manager = None
+
+    @property
+    def db_manager(self):
+        if self._db_manager is None:
+            self._db_manager = DBManager(profile=self.db_profile, near_duplicates=self.near_duplicates,
+                                         similarity=self.similarity)
+        return self._db_manager
 
     def write_to_file(self, record):
-        # Check for duplicates in the file
-        if not self.check_duplicate(record):
-            with open(self.filename, "a") as file:
-                file.write(record.format_record())
-            print("Record added to file.")
+        self.ensure_current()
+        with self.writer:
+            self.writer.begin()
+            try:
+                # Check for duplicates in the file, then insert the record into the database
+                added = self.append_record(record, self.near_duplicate_check())
+                if added:
+                    self.db_manager.insert_record(record)
+            except BaseException:
+                self.discard_appends()
+                raise
+            self.commit_appends()
+        if added:
+            # The statistics with all word frequencies are saved once per import or on close,
+            # a crash before that only costs a rebuild on the next start
             self.recreate_csvs()
-            # Insert the record into the database
-            self.db_manager.insert_record(record)
-        else:
+            self.roll_segment()
+        self.export_metrics()
+
+    def write_records(self, records, batch_size=500):
+        """Write imported records to the file and insert them into the database in batches.
+
+        Returns a tuple of (inserted, duplicates) counts.
+        """
+        self.ensure_current()
+        inserted = 0
+        duplicates = 0
+        self.near_duplicates_dropped = 0
+        records = iter(records)
+        # File appends are flushed once the whole import is done, or when a segment is
+        # closed between database batches so segments stay close to segment_size
+        with self.writer:
+            try:
+                while True:
+                    batch = list(itertools.islice(records, batch_size))
+                    if not batch:
+                        break
+                    added, skipped = self.write_batch(batch)
+                    inserted += added
+                    duplicates += skipped
+                    self.roll_segment()
+            finally:
+                if self.stats.dirty:
+                    self.stats.save()
+
+        dropped = f", {self.near_duplicates_dropped} near duplicates dropped" if self.near_duplicates == "drop" else ""
+        print(f"{inserted} records added to the database, {duplicates} duplicates skipped{dropped}.")
+        self.recreate_csvs()
+        self.export_metrics()
+        return inserted, duplicates
+
+    def write_batch(self, batch):
+        """Append a batch to the feed and insert it into the database in one transaction.
+
+        The appends only count once the database commit succeeded: if the insert
+        fails they're dropped from the feed, its indexes and statistics, so the
+        batch can simply be written again.
+        """
+        self.writer.begin()
+        try:
+            accept = self.near_duplicate_check()
+            appended = [record for record in batch if self.append_record(record, accept)]
+            result = self.db_manager.insert_batch(appended) if appended else (0, 0)
+        except BaseException:
+            self.discard_appends()
+            raise
+        self.commit_appends()
+        return result
+
+    def near_duplicate_check(self):
+        """Return a check that keeps near duplicate news out of the feed when they're dropped, else None.
+
+        Dropped news never reach the file, so the feed and the database keep
+        the same records. A new check is made for every batch.
+        """
+        if self.near_duplicates != "drop":
+            return None
+        db_manager = self.db_manager
+        index = db_manager.near_duplicates
+        batch_index = NearDuplicateIndex(None, index.threshold)
+
+        def accept(record):
+            if not isinstance(record, News):
+                return True
+            signature = index.signature(record.text or "")
+            match = db_manager.match_near_duplicate(signature, batch_index)
+            if match is not None:
+                db_manager.report_dropped(match, record.text)
+                self.near_duplicates_dropped += 1
+                return False
+            batch_index.add(len(batch_index.signatures), signature, persist=False)
+            return True
+        return accept
+
+    def commit_appends(self):
+        self.writer.commit()
+        if self.uncommitted:
+            self.stats.add("".join(self.uncommitted), self.uncommitted_size)
+            self.uncommitted = []
+
+    def discard_appends(self):
+        self.writer.discard()
+        self.uncommitted = []
+
+    def export_metrics(self):
+        metrics.save(self.metrics_file, self.prometheus_file)
+
+    def roll_segment(self):
+        """Close the open segment once it's over the size or age limit."""
+        if self.stats.size == 0 or (self.segment_size is None and self.segment_age is None):
+            return
+        if self.segments.open_since is None:
+            self.segments.open_since = time.time()
+            self.segments.save()
+
+        too_big = self.segment_size is not None and self.stats.size >= self.segment_size
+        too_old = self.segment_age is not None and time.time() - self.segments.open_since >= self.segment_age
+        if too_big or too_old:
+            self.writer.close()
+            self.segments.close_segment(self.filename, self.stats, self.digests)
+            self.stats.rebuild()
+            self.digests.rebuild()
+            self.offsets.rebuild()
+
+    def ensure_current(self):
+        """Rebuild the statistics and the index if the feed file was changed outside of this manager."""
+        self.writer.flush()
+        if self.stats.ensure_current():
+            self.digests.rebuild()
+            self.offsets.rebuild()
+
+    def append_record(self, record, accept=None):
+        """Append a record to the file unless it's a duplicate, return True if it was added.
+
+        accept can turn down records that aren't exact duplicates, see near_duplicate_check.
+        """
+        started = time.perf_counter()
+        duplicate = self.check_duplicate(record)
+        checked = time.perf_counter()
+        metrics.observe("dedupe", checked - started)
+        if duplicate:
+            metrics.count("file_duplicates")
             print(f"Duplicate record detected in file: {record.format_record()}")
+            return False
+        if accept is not None and not accept(record):
+            return False
+
+        formatted = record.format_record()
+        self.uncommitted_size = self.writer.write(formatted)
+        print("Record added to file.")
+        self.uncommitted.append(formatted)
+        self.digests.add(record)
+        metrics.observe("file_append", time.perf_counter() - checked)
+        metrics.count("records_appended")
+        return True
 
     def check_duplicate(self, record):
-        """Check if the record already exists in the file."""
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r') as file:
-                lines = file.readlines()
-                for line in lines:
-                    if line.strip() == record.format_record().strip():
-                        return True
-        return False
+        """Check if the record already exists in the file or one of its closed segments."""
+        return self.digests.contains(record) or self.segments.contains(record)
 
     def recreate_csvs(self):
+        started = time.perf_counter()
+        self.write_csvs()
+        metrics.observe("csv_rebuild", time.perf_counter() - started)
+
+    def write_csvs(self):
+        import csv
         word_count, letter_count, total_letters = self.calculate_counts()
+        words = self.stats.words + self.segments.words if self.segments.segments else self.stats.words
+        letters = self.stats.letters + self.segments.letters if self.segments.segments else self.stats.letters
 
         with open(self.word_count_file, 'w', newline='') as word_file:
             writer = csv.writer(word_file)
-            writer.writerow(["record", "word count"])
-            writer.writerow(["total", word_count])
+            writer.writerow(["record", "word count", "percentage of words"])
+            for word, count in words.most_common(self.csv_top_k):
+                writer.writerow([word, count, f"{count / word_count * 100:.2f}%"])
+            # Summary in its own section, a word can't be taken for it
+            writer.writerow([])
+            writer.writerow(["summary", "word count", "percentage of words"])
+            writer.writerow(["total", word_count, "100.00%" if word_count > 0 else "0.00%"])
         print(f"word count csv '{self.word_count_file}' recreated.")
 
         with open(self.letters_file, 'w', newline='') as letters_file:
             writer = csv.writer(letters_file)
             writer.writerow(["record", "Letter count", "percentage of letters"])
+            for letter, count in letters.most_common(self.csv_top_k):
+                writer.writerow([letter, count, f"{count / letter_count * 100:.2f}%"])
+            writer.writerow([])
+            writer.writerow(["summary", "Letter count", "percentage of letters"])
             writer.writerow(["total", letter_count, f"{(letter_count / total_letters * 100) if total_letters > 0 else 0:.2f}%"])
         print(f"letters csv '{self.letters_file}' recreated.")
 
     def calculate_counts(self):
-        word_count = 0
-        letter_count = 0
-        total_letters = 0
+        """Return the running totals of the open segment plus the saved ones of the closed segments."""
+        return (self.stats.word_count + self.segments.word_count,
+                self.stats.letter_count + self.segments.letter_count,
+                self.stats.total_letters + self.segments.total_letters)
 
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r') as file:
-                lines = file.readlines()
+    def rebuild_stats(self):
+        """Force a full re-scan of the open segment and recreate the CSVs."""
+        self.writer.flush()
+        self.stats.rebuild()
+        self.digests.rebuild()
+        self.offsets.rebuild()
+        self.recreate_csvs()
 
-            for line in lines:
-                line = line.strip().lower()
-                words = re.findall(r'\w+', line)
-                word_count += len(words)
-                total_letters += len(line.replace(" ", ""))  
-                letter_count += len([char for char in line if char.isalpha()])
+    def reader(self):
+        """Return a FeedReader over the open segment, close it when done."""
+        self.writer.flush()
+        return FeedReader(self.filename, self.offsets_file)
+
+    def export_snapshot(self, path="news_feed.snapshot"):
+        """Write a columnar snapshot of the closed segments and the feed file, see FeedSnapshot."""
+        self.writer.flush()
+        count = FeedSnapshot.export(self.segments.paths() + [self.filename], path)
+        print(f"Snapshot '{path}' with {count} records exported.")
+        return count
+
+    def close(self):
+        """Flush the feed file, save the statistics and close the database connection."""
+        self.writer.close()
+        if self.stats.dirty:
+            self.stats.save()
+        if self._db_manager is not None:
+            self._db_manager.close()
+        self.export_metrics()
+        if self.profile_file:
+            metrics.stop_profile(self.profile_file)
+
+
+# ImportReport collects the rows rejected during an import instead of raising for each of them
+class ImportReport:
+    def __init__(self, source=""):
+        self.source = source
+        self.accepted = 0
+        self.rejects = []
+        self.failures = []  # files that couldn't be parsed to the end
+
+    def fail(self, source, error):
+        self.failures.append({"source": source, "error": str(error)})
+
+    def reject(self, position, text, expiration_date, reason):
+        self.rejects.append({
+            "position": position,
+            "text": text,
+            "expiration_date": expiration_date,
+            "reason": reason,
+        })
+
+    def merge(self, other):
+        self.accepted += other.accepted
+        for reject in other.rejects:
+            self.rejects.append(dict(reject, source=other.source))
+        self.failures.extend(other.failures)
+
+    def to_dict(self):
+        return {"source": self.source, "accepted": self.accepted, "rejected": len(self.rejects), "rejects": self.rejects,
+                "failed": self.failures}
+
+    def save(self, path):
+        import json
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+
+    def print_summary(self, limit=10):
+        for failure in self.failures:
+            print(f"Failed to parse '{failure['source']}': {failure['error']}")
+        if not self.rejects:
+            return
+        print(f"{len(self.rejects)} rows rejected ({self.accepted} private ads accepted):")
+        for reject in self.rejects[:limit]:
+            print(f"  {reject.get('source', self.source)} #{reject['position']}: {reject['reason']}")
+        if len(self.rejects) > limit:
+            print(f"  ... and {len(self.rejects) - limit} more")
 
-        return word_count, letter_count, total_letters
+
+def validate_private_ads(rows, report):
+    """Validate a batch of (position, text, expiration_date) rows up front.
+
+    Returns a list aligned with rows holding a PrivateAd for every valid row
+    and None for every rejected one, rejects are added to the report.
+    """
+    records = []
+    for position, text, expiration_date in rows:
+        if not isinstance(text, str) or not text.strip():
+            report.reject(position, text, expiration_date, "missing text")
+            records.append(None)
+        elif parse_expiration_date(expiration_date) is None:
+            report.reject(position, text, expiration_date,
+                          f"invalid expiration date '{expiration_date}', expected YYYY-MM-DD")
+            records.append(None)
+        else:
+            # The date is memoized by now, so the constructor doesn't parse it again
+            records.append(PrivateAd(text, expiration_date))
+    report.accepted += len(rows) - records.count(None)
+    metrics.count("private_ads_rejected", records.count(None))
+    return records
+
+
+def parse_batches(items, parse_item, private_ad_fields, report, batch_size=500):
+    """Yield the records parsed from items, validating the private ads of each batch together.
+
+    private_ad_fields(item) returns (text, expiration_date) for a private ad and
+    None for anything else, which is parsed by parse_item right away. Items are
+    only looked at while they're current, so cleared XML elements are fine.
+    """
+    records = []
+    ad_slots = []
+    ad_rows = []
+    for position, item in enumerate(items, 1):
+        started = time.perf_counter()
+        fields = private_ad_fields(item)
+        if fields is None:
+            record = parse_item(item)
+            if record is not None:
+                records.append(record)
+            else:
+                metrics.count("records_invalid")
+        else:
+            ad_slots.append(len(records))
+            ad_rows.append((position, fields[0], fields[1]))
+            records.append(None)
+        metrics.observe("parse", time.perf_counter() - started)
+
+        if len(records) >= batch_size:
+            yield from fill_private_ads(records, ad_slots, ad_rows, report)
+            records, ad_slots, ad_rows = [], [], []
+    yield from fill_private_ads(records, ad_slots, ad_rows, report)
+
+
+def fill_private_ads(records, ad_slots, ad_rows, report):
+    started = time.perf_counter()
+    for slot, record in zip(ad_slots, validate_private_ads(ad_rows, report)):
+        records[slot] = record
+    # Validation is part of parsing, but it's timed once per batch rather than per record
+    metrics.observe("parse", time.perf_counter() - started, 0)
+    records = [record for record in records if record is not None]
+    metrics.count("records_parsed", len(records))
+    return records
 
 
 class FileInputManager:
+    # Magic bytes of the compressed formats supported by the standard library
+    COMPRESSED_FORMATS = [
+        (b"\x1f\x8b", "gzip"),
+        (b"BZh", "bz2"),
+        (b"\xfd7zXZ\x00", "lzma"),
+    ]
+
     def __init__(self, manager, default_folder="records"):
         self.manager = manager
         self.default_folder = default_folder
 
+    def open_input(self, file_path):
+        """Open the input file as text, decompressing it on the fly if needed."""
+        with open(file_path, 'rb') as file:
+            header = file.read(6)
+        for magic, module in self.COMPRESSED_FORMATS:
+            if header.startswith(magic):
+                return importlib.import_module(module).open(file_path, 'rt')
+        return open(file_path, 'r')
+
     def normalize_case(self, text):
         return text.lower()
 
-    def process_file(self, file_path=None):
+    def process_file(self, file_path=None, chunk_size=500):
         if file_path is None:
             file_path = input(f"Enter the file path (default is '{self.default_folder}'): ")
             if not file_path:
@@ -216,19 +2201,90 @@ class FileInputManager:
             print(f"File '{file_path}' does not exist.")
             return
         
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            self.process_record_from_line(line)
+        # Lines are read lazily, parsed and validated in batches and handed to the database in chunks
+        report = ImportReport(file_path)
+        with self.open_input(file_path) as file:
+            lines = (line.strip() for line in file if line.strip())
+            records = parse_batches(lines, self.parse_record_from_line, self.private_ad_fields, report, chunk_size)
+            self.manager.write_records(records, chunk_size)
         
         os.remove(file_path)
         print(f"File '{file_path}' processed and removed successfully.")
+        report.print_summary()
+        return report
+
+    def process_folder(self, folder_path=None, workers=None, chunk_size=500):
+        """Import every .txt, .json and .xml file of a folder.
+
+        Files are parsed in a process pool, while this process stays the only
+        writer of the feed file and the database.
+        """
+        if folder_path is None:
+            folder_path = input(f"Enter the folder path (default is '{self.default_folder}'): ")
+            if not folder_path:
+                folder_path = self.default_folder
+
+        if not os.path.isdir(folder_path):
+            print(f"Folder '{folder_path}' does not exist.")
+            return
+
+        file_paths = sorted(
+            os.path.join(folder_path, name) for name in os.listdir(folder_path)
+            if os.path.splitext(name)[1].lower() in IMPORT_EXTENSIONS
+        )
+        if not file_paths:
+            print(f"No files to import in '{folder_path}'.")
+            return
+
+        report = ImportReport(folder_path)
+        from concurrent.futures import ProcessPoolExecutor
+        in_flight = workers or os.cpu_count() or 1
+
+        def records_of(executor):
+            # Only a few files are parsed ahead, so memory doesn't grow with the size of the folder
+            remaining = iter(file_paths)
+            pending = deque()
+            for file_path in itertools.islice(remaining, in_flight):
+                pending.append(executor.submit(parse_input_file, file_path))
+            while pending:
+                records, file_report = pending.popleft().result()
+                for file_path in itertools.islice(remaining, 1):
+                    pending.append(executor.submit(parse_input_file, file_path))
+                report.merge(file_report)
+                # A file is imported whole or not at all, the kept file is imported again once fixed
+                if not file_report.failures:
+                    yield from records
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            self.manager.write_records(records_of(executor), chunk_size)
+
+        # Files that failed to parse are kept so they can be fixed and imported again
+        failed = {failure["source"] for failure in report.failures}
+        imported = [file_path for file_path in file_paths if file_path not in failed]
+        for file_path in imported:
+            os.remove(file_path)
+        print(f"{len(imported)} files from '{folder_path}' processed and removed successfully.")
+        if failed:
+            print(f"{len(failed)} files from '{folder_path}' failed to parse and were kept.")
+        report.print_summary()
+        return report
 
     def process_record_from_line(self, line):
+        started = time.perf_counter()
+        record = self.parse_record_from_line(line)
+        metrics.observe("parse", time.perf_counter() - started)
+        if record is not None:
+            metrics.count("records_parsed")
+            self.manager.write_to_file(record)
+
+    def private_ad_fields(self, line):
+        """Return (text, expiration_date) of a private ad line, None for any other line."""
+        parts = line.split('|')
+        if len(parts) < 3 or self.normalize_case(parts[0].strip()) != "private ad":
+            return None
+        return self.normalize_case(parts[1].strip()), parts[2].strip()
+
+    def parse_record_from_line(self, line):
         try:
             parts = [item.strip() for item in line.split('|')]
             record_type = self.normalize_case(parts[0])
@@ -260,7 +2316,7 @@ class FileInputManager:
                 print(f"Unknown record type: {line}")
                 return
 
-            self.manager.write_to_file(record)
+            return record
         except Exception as e:
             print(f"Error processing line '{line}': {e}")
 
@@ -274,19 +2330,109 @@ class JsonInputManager:
             print(f"JSON file '{file_path}' does not exist.")
             return
         
+        report = ImportReport(file_path)
+        records = parse_batches(self.iter_records(file_path, report=report), self.parse_record,
+                                self.private_ad_fields, report)
+        self.manager.write_records(records)
+        report.print_summary()
+        return report
+
+    @staticmethod
+    def private_ad_fields(record):
+        if not isinstance(record, dict) or str(record.get('type', '')).lower() != "private ad":
+            return None
+        return record.get('text'), record.get('expiration_date')
+
+    # A decode error this close to the end of the buffer may just be a record cut off by the chunk
+    TRUNCATION_MARGIN = 16
+
+    def iter_records(self, file_path, chunk_size=65536, report=None):
+        """Yield records one at a time from a JSON array or a JSON Lines file.
+
+        Arrays are read in chunks and decoded with raw_decode, JSON Lines line by
+        line, so only the current chunk or line and the record being decoded are
+        held in memory.
+        """
         with open(file_path, 'r') as file:
-            records = json.load(file)
-        
-        for record in records:
+            first = file.read(chunk_size)
+            stripped = first.lstrip()
+            while first and not stripped:
+                first = file.read(chunk_size)
+                stripped = first.lstrip()
+            if stripped.startswith("["):
+                yield from self.iter_array(file, file_path, stripped[1:], chunk_size, report)
+            else:
+                file.seek(0)
+                yield from self.iter_lines(file, file_path, report)
+
+    def iter_array(self, file, file_path, buffer, chunk_size, report):
+        import json
+        decoder = json.JSONDecoder()
+        position = 0
+        eof = False
+        while True:
+            # Skip whitespace and the commas between array items
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    break
+                buffer = file.read(chunk_size)
+                position = 0
+                eof = not buffer
+                continue
+            if buffer[position] == "]":
+                break
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith("Unterminated string") or e.pos >= len(buffer) - self.TRUNCATION_MARGIN
+                if eof or not truncated:
+                    print(f"Error: Invalid JSON format in '{file_path}': {e}")
+                    if report is not None:
+                        report.fail(file_path, e)
+                    break
+                end = None
+
+            # Record may continue in the next chunk
+            if end is None or (end == len(buffer) and not eof):
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield record
+            position = end
+
+    def iter_lines(self, file, file_path, report):
+        """Yield the records of a JSON Lines file, a malformed line is rejected and the rest still imported."""
+        import json
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Error: Invalid JSON on line {number} of '{file_path}': {e}")
+                if report is not None:
+                    report.reject(number, line[:200], None, f"invalid JSON: {e}")
+
+    def parse_record(self, record):
+        try:
             record_type = record.get('type').lower()
             if record_type == "news":
-                self.manager.write_to_file(News(record['city'], record['text']))
+                return News(record['city'], record['text'])
             elif record_type == "private ad":
-                self.manager.write_to_file(PrivateAd(record['text'], record['expiration_date']))
+                return PrivateAd(record['text'], record['expiration_date'])
             elif record_type == "custom record":
-                self.manager.write_to_file(CustomRecord(record['record_type'], record['data']))
+                return CustomRecord(record['record_type'], record['data'])
             else:
                 print(f"Unknown record type: {record_type}")
+        except Exception as e:
+            print(f"Error processing record '{record}': {e}")
 
 
 class XmlInputManager:
@@ -298,29 +2444,97 @@ class XmlInputManager:
             print(f"XML file '{file_path}' does not exist.")
             return
         
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        
-        for record in root.findall('record'):
-            record_type = record.find('type').text.lower()
+        report = ImportReport(file_path)
+        records = parse_batches(self.iter_records(file_path, report=report), self.parse_record,
+                                self.private_ad_fields, report)
+        self.manager.write_records(records)
+        report.print_summary()
+        return report
+
+    def private_ad_fields(self, record):
+        if self.record_type_of(record) != "private ad":
+            return None
+        return record.findtext('text'), record.findtext('expiration_date')
+
+    def iter_records(self, file_path, report=None):
+        """Yield each <record> element as soon as it's closed, then clear it to keep memory flat."""
+        import xml.etree.ElementTree as ET
+        try:
+            context = ET.iterparse(file_path, events=("start", "end"))
+            _, root = next(context)
+            for event, element in context:
+                if event == "end" and element.tag == "record":
+                    yield element
+                    element.clear()
+                    root.clear()
+        except ET.ParseError as e:
+            print(f"Error: Invalid XML format in '{file_path}': {e}")
+            if report is not None:
+                report.fail(file_path, e)
+
+    @staticmethod
+    def record_type_of(record):
+        """Read the record type from either a type= attribute or a <type> child element."""
+        record_type = record.get('type') or record.findtext('type') or ""
+        return record_type.strip().lower()
+
+    def parse_record(self, record):
+        try:
+            record_type = self.record_type_of(record)
             if record_type == "news":
                 city = record.find('city').text
                 text = record.find('text').text
-                self.manager.write_to_file(News(city, text))
+                return News(city, text)
             elif record_type == "private ad":
                 text = record.find('text').text
                 expiration_date = record.find('expiration_date').text
-                self.manager.write_to_file(PrivateAd(text, expiration_date))
+                return PrivateAd(text, expiration_date)
             elif record_type == "custom record":
-                custom_fields = record.find('data').text
-                self.manager.write_to_file(CustomRecord(record_type, custom_fields))
+                custom_fields = record.findtext('data') or record.findtext('custom_fields')
+                return CustomRecord(record_type, custom_fields)
             else:
                 print(f"Unknown record type in XML: {record_type}")
+        except Exception as e:
+            import xml.etree.ElementTree as ET
+            print(f"Error processing record '{ET.tostring(record, encoding='unicode')}': {e}")
+
+
+# File extensions picked up by a folder import
+IMPORT_EXTENSIONS = (".txt", ".json", ".jsonl", ".xml")
+
+
+def parse_input_file(file_path):
+    """Parse a whole input file into a list of records and an ImportReport, run by the folder import workers.
+
+    Files that can't be parsed to the end are listed in report.failures.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    report = ImportReport(file_path)
+    records = []
+    try:
+        if extension in (".json", ".jsonl"):
+            input_manager = JsonInputManager(None)
+            records = list(parse_batches(input_manager.iter_records(file_path, report=report),
+                                         input_manager.parse_record, input_manager.private_ad_fields, report))
+        elif extension == ".xml":
+            input_manager = XmlInputManager(None)
+            records = list(parse_batches(input_manager.iter_records(file_path, report=report),
+                                         input_manager.parse_record, input_manager.private_ad_fields, report))
+        else:
+            input_manager = FileInputManager(None)
+            with input_manager.open_input(file_path) as file:
+                lines = (line.strip() for line in file if line.strip())
+                records = list(parse_batches(lines, input_manager.parse_record_from_line,
+                                             input_manager.private_ad_fields, report))
+    except (OSError, EOFError, UnicodeDecodeError) as e:
+        # Unreadable or truncated (compressed) file
+        report.fail(file_path, e)
+    return records, report
 
 
 class Application:
-    def __init__(self):
-        self.manager = NewsFeedManager()
+    def __init__(self, db_profile="balanced", near_duplicates="off", csv_top_k=1000):
+        self.manager = NewsFeedManager(db_profile=db_profile, near_duplicates=near_duplicates, csv_top_k=csv_top_k)
         self.file_input_manager = FileInputManager(self.manager)
         self.json_input_manager = JsonInputManager(self.manager)
         self.xml_input_manager = XmlInputManager(self.manager)
@@ -352,6 +2566,12 @@ class Application:
     def import_records_from_xml(self):
         self.xml_input_manager.process_xml_file()
 
+    def import_records_from_folder(self):
+        self.file_input_manager.process_folder()
+
+    def purge_expired_ads(self):
+        self.manager.db_manager.purge_expired_ads()
+
     def run(self):
         while True:
             print("\nPlease choose one of the following options:")
@@ -361,9 +2581,11 @@ class Application:
             print("4. Import Records from File")
             print("5. Import Records from JSON File")
             print("6. Import Records from XML File")
-            print("7. Exit")
+            print("7. Import Records from Folder")
+            print("8. Purge Expired Private Ads")
+            print("9. Exit")
 
-            choice = input("Enter your choice (1, 2, 3, 4, 5, 6, or 7): ")
+            choice = input("Enter your choice (1, 2, 3, 4, 5, 6, 7, 8, or 9): ")
 
             if choice == '1':
                 self.add_news_record()
@@ -378,8 +2600,12 @@ class Application:
             elif choice == '6':
                 self.import_records_from_xml()
             elif choice == '7':
+                self.import_records_from_folder()
+            elif choice == '8':
+                self.purge_expired_ads()
+            elif choice == '9':
                 print("Exiting...")
-                self.manager.db_manager.close()
+                self.manager.close()
                 break
             else:
                 print("Invalid choice. Please, let's try again.")
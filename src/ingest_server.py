@@ -0,0 +1,200 @@
+import sys
+import asyncio
+import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import hw9
+
+
+# IngestServer accepts newline-delimited records from many producers and writes them in batches
+class IngestServer:
+    def __init__(self, host="127.0.0.1", port=8765, unix_path=None, queue_size=10000,
+                 batch_size=500, batch_timeout=0.5, manager_factory=hw9.NewsFeedManager, retries=3, retry_delay=0.5):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.manager_factory = manager_factory
+        self.retries = retries  # attempts for a batch that failed, e.g. with "database is locked"
+        self.retry_delay = retry_delay
+        self.parser = hw9.FileInputManager(None)
+        # The manager owns a SQLite connection, so it lives on a single writer thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.manager = None
+        self.queue = None
+        self.server = None
+        self.received = 0
+        self.dropped = 0
+
+    async def handle_client(self, reader, writer):
+        """Parse lines from one producer, waiting whenever the queue is full."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8', errors='replace').strip()
+                if not line:
+                    continue
+                record = self.parser.parse_record_from_line(line)
+                if record is not None:
+                    # Blocks this producer (and so its socket reads) until the writer catches up
+                    await self.queue.put(record)
+                    self.received += 1
+        finally:
+            writer.close()
+
+    async def next_batch(self):
+        """Wait for a record, then collect more until the batch is full or the timeout runs out.
+
+        Returns the batch and a flag telling whether the server is shutting down.
+        """
+        loop = asyncio.get_running_loop()
+        record = await self.queue.get()
+        if record is None:
+            return [], True
+
+        batch = [record]
+        deadline = loop.time() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                record = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if record is None:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    async def write_batches(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self.next_batch()
+            if batch:
+                await self.write_batch(batch)
+
+    async def write_batch(self, batch):
+        """Write one batch, retrying a few times; a batch that keeps failing is dropped so the writer keeps going.
+
+        A batch is never bigger than batch_size, so the manager writes it in one
+        transaction: a failed attempt leaves nothing in the feed or the database
+        and the next attempt appends the whole batch again.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.retries + 1):
+            try:
+                await loop.run_in_executor(self.executor, self.manager.write_records, batch, self.batch_size)
+                return
+            except Exception as e:
+                print(f"Error writing a batch of {len(batch)} records (attempt {attempt}/{self.retries}): {e}")
+                if attempt < self.retries:
+                    await asyncio.sleep(self.retry_delay * attempt)
+        self.dropped += len(batch)
+        hw9.metrics.count("records_dropped", len(batch))
+        print(f"Batch of {len(batch)} records dropped.")
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.manager = await loop.run_in_executor(self.executor, self.manager_factory)
+        writer_task = asyncio.create_task(self.write_batches())
+
+        if self.unix_path:
+            self.server = await asyncio.start_unix_server(self.handle_client, path=self.unix_path)
+            print(f"Ingestion server listening on '{self.unix_path}'.")
+        else:
+            self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+            print(f"Ingestion server listening on {self.host}:{self.port}.")
+
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Let the writer drain everything that was already queued, unless it's gone
+            if not writer_task.done():
+                await self.queue.put(None)
+            try:
+                await writer_task
+            except Exception as e:
+                print(f"Ingestion writer failed: {e}")
+            await loop.run_in_executor(self.executor, self.manager.close)
+            self.executor.shutdown()
+            print(f"Ingestion server stopped after {self.received} records, {self.dropped} dropped.")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+
+
+async def send_records(lines, host="127.0.0.1", port=8765, unix_path=None):
+    """Send records to a running ingestion server, one per line."""
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    count = 0
+    for line in lines:
+        line = line.strip()
+        if line:
+            writer.write(line.encode('utf-8') + b"\n")
+            await writer.drain()
+            count += 1
+    writer.close()
+    await writer.wait_closed()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local asyncio ingestion server for the news feed.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", dest="unix_path", help="listen on / connect to a Unix socket instead of TCP")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the ingestion server")
+    serve_parser.add_argument("--queue-size", type=int, default=10000)
+    serve_parser.add_argument("--batch-size", type=int, default=500)
+    serve_parser.add_argument("--batch-timeout", type=float, default=0.5)
+    serve_parser.add_argument("--metrics-file", help="write stage metrics as JSON after every batch")
+    serve_parser.add_argument("--prometheus-file", help="write stage metrics in Prometheus text format after every batch")
+    serve_parser.add_argument("--profile", dest="profile_file", help="capture a cProfile of the run into this file")
+    serve_parser.add_argument("--purge-interval", type=float, metavar="SECONDS",
+                              help="archive expired private ads in the background every SECONDS")
+
+    send_parser = commands.add_parser("send", help="send records in 'Type|City|Text' lines to the server")
+    send_parser.add_argument("file", nargs="?", help="file with records, stdin if omitted")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        manager_factory = functools.partial(hw9.NewsFeedManager, metrics_file=args.metrics_file,
+                                            prometheus_file=args.prometheus_file, profile_file=args.profile_file)
+        server = IngestServer(args.host, args.port, args.unix_path, args.queue_size,
+                              args.batch_size, args.batch_timeout, manager_factory)
+        sweeper = None
+        if args.purge_interval:
+            sweeper = hw9.ExpiredAdSweeper(interval=args.purge_interval)
+            sweeper.start()
+        try:
+            asyncio.run(server.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if sweeper is not None:
+                sweeper.stop()
+    else:
+        source = open(args.file, 'r') if args.file else sys.stdin
+        with source:
+            count = asyncio.run(send_records(source, args.host, args.port, args.unix_path))
+        print(f"{count} records sent.")
+
+
+if __name__ == "__main__":
+    main()
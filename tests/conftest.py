@@ -0,0 +1,47 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import hw9  # noqa: E402
+
+
+@pytest.fixture
+def feed_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def locked_database(monkeypatch):
+    """Make a DBManager method raise 'database is locked' on its first `times` calls."""
+    def lock(method, times=1):
+        original = getattr(hw9.DBManager, method)
+        calls = []
+
+        def failing(self, *args, **kwargs):
+            calls.append(args)
+            if len(calls) <= times:
+                raise sqlite3.OperationalError("database is locked")
+            return original(self, *args, **kwargs)
+        monkeypatch.setattr(hw9.DBManager, method, failing)
+        return calls
+    return lock
+
+
+def feed_lines(path="news_feed.txt"):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [line for line in file if line.strip()]
+
+
+def table_rows(table, db_name="news_feed.db"):
+    connection = sqlite3.connect(db_name)
+    try:
+        return connection.execute(f"SELECT * FROM {table}").fetchall()
+    finally:
+        connection.close()
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+
+import pytest
+
+import hw9
+from conftest import feed_lines, table_rows
+
+
+def test_import_is_retried_after_a_failed_database_batch(feed_folder, locked_database):
+    with open("in.txt", "w") as file:
+        file.write("News | Kyiv | Bridge opened\n")
+        file.write("Private Ad | Selling a bike | 2040-01-01\n")
+    locked_database("insert_batch")
+
+    manager = hw9.NewsFeedManager()
+    importer = hw9.FileInputManager(manager)
+    with pytest.raises(sqlite3.OperationalError):
+        importer.process_file("in.txt")
+    # Nothing of the failed batch is visible, and the input is kept for the retry
+    assert os.path.exists("in.txt")
+    assert feed_lines() == []
+    assert manager.stats.word_count == 0
+
+    importer.process_file("in.txt")
+    manager.close()
+
+    assert not os.path.exists("in.txt")
+    assert len(feed_lines()) == 2
+    assert len(table_rows("news_records")) == 1
+    assert len(table_rows("private_ad_records")) == 1
+    with open("feed-digests.idx") as file:
+        assert len([line for line in file if line.strip()]) == 2
+
+
+def test_failed_single_record_is_not_written_to_the_feed(feed_folder, locked_database):
+    locked_database("insert_record")
+    manager = hw9.NewsFeedManager()
+    record = hw9.News("Lviv", "Concert in the park")
+    with pytest.raises(sqlite3.OperationalError):
+        manager.write_to_file(record)
+    assert feed_lines() == []
+
+    manager.write_to_file(record)
+    manager.close()
+    assert len(feed_lines()) == 1
+    assert len(table_rows("news_records")) == 1
+
+
+def test_malformed_json_lines_are_rejected_and_the_rest_imported(feed_folder):
+    with open("in.jsonl", "w") as file:
+        file.write("{not json\n")
+        file.write('{"type": "news", "city": "Kyiv", "text": "Bridge opened"}\n')
+        file.write('{"type": "news", "city": "Lviv", "text": "Concert in the park"}\n')
+
+    manager = hw9.NewsFeedManager()
+    report = hw9.JsonInputManager(manager).process_json_file("in.jsonl")
+    manager.close()
+
+    assert [reject["position"] for reject in report.rejects] == [1]
+    assert len(table_rows("news_records")) == 2
+
+
+def test_dropped_near_duplicates_stay_out_of_the_feed(feed_folder):
+    manager = hw9.NewsFeedManager(near_duplicates="drop")
+    manager.write_records([hw9.News("Kyiv", "The mayor opened a new bridge over the river today")])
+    manager.write_records([
+        hw9.News("Odesa", "The mayor opened a new bridge over the river today!"),
+        hw9.News("Lviv", "Concert in the park tonight"),
+        hw9.News("Lviv", "Concert in the park tonight!"),
+    ])
+    manager.write_to_file(hw9.News("Dnipro", "Today the mayor opened a new bridge over the river"))
+    manager.close()
+
+    assert len(feed_lines()) == 2
+    assert len(table_rows("news_records")) == 2
+    assert manager.stats.word_count == hw9.FeedStatistics("news_feed.txt", "rescan.json").word_count
+
+
+def test_single_news_insert_advances_its_bloom_filter(feed_folder):
+    db_manager = hw9.DBManager()
+    db_manager.insert_batch([hw9.PrivateAd(f"Ad {number}", "2040-01-01") for number in range(5)])
+    db_manager.insert_batch([hw9.News("Kyiv", f"News {number}") for number in range(3)])
+    db_manager.insert_record(hw9.News("Kyiv", "News 3"))
+
+    assert db_manager.blooms["news_records"].last_id == 4
+    assert db_manager.blooms["private_ad_records"].last_id == 5
+    db_manager.close()
@@ -0,0 +1,36 @@
+import asyncio
+
+import hw9
+from conftest import feed_lines, table_rows
+from ingest_server import IngestServer
+
+
+def write_with_retries(batch, retries=3):
+    server = IngestServer(retries=retries, retry_delay=0)
+    server.manager = hw9.NewsFeedManager()
+    try:
+        asyncio.run(server.write_batch(batch))
+    finally:
+        # The database connection belongs to the writer thread
+        server.executor.submit(server.manager.close).result()
+        server.executor.shutdown()
+    return server
+
+
+def test_failed_batch_is_written_again_on_retry(feed_folder, locked_database):
+    calls = locked_database("insert_batch")
+    server = write_with_retries([hw9.News("Kyiv", "Bridge opened"), hw9.News("Odesa", "Port reopened")])
+
+    assert len(calls) == 2
+    assert server.dropped == 0
+    assert len(feed_lines()) == 2
+    assert len(table_rows("news_records")) == 2
+
+
+def test_batch_that_keeps_failing_is_dropped(feed_folder, locked_database):
+    locked_database("insert_batch", times=3)
+    server = write_with_retries([hw9.News("Kyiv", "Bridge opened"), hw9.News("Odesa", "Port reopened")])
+
+    assert server.dropped == 2
+    assert feed_lines() == []
+    assert table_rows("news_records") == []